@@ -0,0 +1,49 @@
+# Centroid coordinates for every city in the crime dataset
+city_coordinates = {
+    "Agra": {"lat": 27.1752554, "lng": 78.0098161},
+    "Ahmedabad": {"lat": 23.0215374, "lng": 72.5800568},
+    "Bangalore": {"lat": 12.9767936, "lng": 77.590082},
+    "Bhopal": {"lat": 23.2584857, "lng": 77.401989},
+    "Chennai": {"lat": 13.0836939, "lng": 80.270186},
+    "Delhi": {"lat": 28.6517178, "lng": 77.2219388},
+    "Faridabad": {"lat": 28.4031478, "lng": 77.3105561},
+    "Ghaziabad": {"lat": 28.6711527, "lng": 77.4120356},
+    "Hyderabad": {"lat": 17.360589, "lng": 78.4740613},
+    "Indore": {"lat": 22.7203616, "lng": 75.8681996},
+    "Jaipur": {"lat": 26.9154576, "lng": 75.8189817},
+    "Kalyan": {"lat": 19.2396742, "lng": 73.1366482},
+    "Kanpur": {"lat": 26.4609135, "lng": 80.3217588},
+    "Kolkata": {"lat": 22.5726459, "lng": 88.3638953},
+    "Lucknow": {"lat": 26.8381, "lng": 80.9346001},
+    "Ludhiana": {"lat": 30.9090157, "lng": 75.851601},
+    "Meerut": {"lat": 28.9963296, "lng": 77.7061915},
+    "Mumbai": {"lat": 19.054999, "lng": 72.8692035},
+    "Nagpur": {"lat": 21.1498134, "lng": 79.0820556},
+    "Nashik": {"lat": 20.0112475, "lng": 73.7902364},
+    "Patna": {"lat": 25.6093239, "lng": 85.1235252},
+    "Pune": {"lat": 18.5213738, "lng": 73.8545071},
+    "Rajkot": {"lat": 22.3053263, "lng": 70.8028377},
+    "Srinagar": {"lat": 34.0747444, "lng": 74.8204443},
+    "Surat": {"lat": 21.2094892, "lng": 72.8317058},
+    "Thane": {"lat": 19.1943294, "lng": 72.9701779},
+    "Varanasi": {"lat": 25.3356491, "lng": 83.0076292},
+    "Vasai": {"lat": 19.3428238, "lng": 72.805441},
+    "Visakhapatnam": {"lat": 17.6935526, "lng": 83.2921297}
+}
+
+_city_lookup = {city.lower(): coords for city, coords in city_coordinates.items()}
+
+
+def city_point(city):
+    """GeoJSON Point for a known city (case-insensitive), or None."""
+    coords = _city_lookup.get(str(city or '').strip().lower())
+    if coords is None:
+        return None
+    return {"type": "Point", "coordinates": [coords["lng"], coords["lat"]]}
+
+
+def geo_point(latitude=None, longitude=None, city=None):
+    """GeoJSON Point from explicit coordinates, falling back to the city centroid."""
+    if latitude is not None and longitude is not None:
+        return {"type": "Point", "coordinates": [float(longitude), float(latitude)]}
+    return city_point(city)
@@ -1,6 +1,7 @@
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
+from pymongo.errors import OperationFailure
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 
@@ -23,22 +24,57 @@ sync_db = sync_client[DATABASE_NAME]
 crimes_collection = async_db.crimes
 subscribers_collection = async_db.subscribers
 predictions_collection = async_db.predictions
+alert_outbox_collection = async_db.alert_outbox
+
+# How long delivered alert jobs are kept before Mongo's TTL monitor removes them
+ALERT_OUTBOX_RETENTION_SECONDS = int(os.getenv("ALERT_OUTBOX_RETENTION_DAYS", 7)) * 86400
 
 # Create indexes
-async def create_indexes():
-    # Crimes collection indexes
-    await crimes_collection.create_index([("date_time", -1)])
-    await crimes_collection.create_index([("state", 1), ("city", 1)])
-    await crimes_collection.create_index([("location", "2dsphere")])
-    
+INDEXES = [
+    # Crimes collection indexes; "location" is the reporter's free-text address,
+    # the incident coordinates live in "geo"
+    (crimes_collection, [("date_time", -1)], {}),
+    (crimes_collection, [("state", 1), ("city", 1)], {}),
+    (crimes_collection, [("geo", "2dsphere")], {}),
+    # Only reports whose alerts are not queued yet carry the flag
+    (crimes_collection, [("alerts_pending", 1)], {"sparse": True}),
+
     # Subscribers collection indexes
-    await subscribers_collection.create_index([("email", 1)], unique=True)
-    await subscribers_collection.create_index([("phone", 1)], unique=True)
-    await subscribers_collection.create_index([("location", "2dsphere")])
-    
+    (subscribers_collection, [("location", "2dsphere")], {}),
+    (subscribers_collection, [("email", 1)], {"unique": True}),
+    (subscribers_collection, [("phone", 1)], {"unique": True}),
+
     # Predictions collection indexes
-    await predictions_collection.create_index([("timestamp", -1)])
-    await predictions_collection.create_index([("state", 1), ("city", 1)])
+    (predictions_collection, [("timestamp", -1)], {}),
+    (predictions_collection, [("state", 1), ("city", 1)], {}),
+
+    # Alert outbox: workers claim due jobs; finished jobs expire, dead letters stay
+    (alert_outbox_collection, [("status", 1), ("next_attempt_at", 1)], {}),
+    (alert_outbox_collection, [("completed_at", 1)], {"expireAfterSeconds": ALERT_OUTBOX_RETENTION_SECONDS}),
+]
+
+# Indexes that are no longer used; dropped on startup where an older deployment created them
+DROPPED_INDEXES = [
+    # Was built on the free-text "location" address; the geo queries use "geo"
+    (crimes_collection, "location_2dsphere"),
+]
+
+async def create_indexes():
+    """Create every index; one failing (e.g. duplicate data) does not stop the rest."""
+    for collection, name in DROPPED_INDEXES:
+        try:
+            await collection.drop_index(name)
+        except OperationFailure as e:
+            # 27 (IndexNotFound): already gone, or never created
+            if e.code != 27:
+                print(f"Could not drop index {name} on {collection.name}: {str(e)}")
+        except Exception as e:
+            print(f"Could not drop index {name} on {collection.name}: {str(e)}")
+    for collection, keys, options in INDEXES:
+        try:
+            await collection.create_index(keys, **options)
+        except Exception as e:
+            print(f"Could not create index {keys} on {collection.name}: {str(e)}")
 
 @asynccontextmanager
 # srcc/backend/config/database.py (or similar)
@@ -1,5 +1,7 @@
 import os
 import smtplib
+from html import escape
+from string import Template
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from dotenv import load_dotenv
@@ -7,22 +9,10 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-async def send_email_to_subscriber(email, report):
-    smtp_server = os.getenv('SMTP_SERVER')
-    smtp_port = int(os.getenv('SMTP_PORT', 587))
-    smtp_user = os.getenv('SMTP_USER')
-    smtp_password = os.getenv('SMTP_PASSWORD')
-    from_email = os.getenv('FROM_EMAIL', smtp_user)
-
-    subject = f"🚨 Crime Alert: {report.get('crime_type', 'Unknown Crime')} in {report.get('city', 'your area')}"
-    crime_type = report.get('crime_type', 'N/A')
-    location = report.get('location', 'N/A')
-    description = report.get('description', 'N/A')
-    date = report.get('date', 'N/A')
-    time = report.get('time', 'N/A')
-    date_time = f"{date} {time}" if date != 'N/A' and time != 'N/A' else date or time or 'N/A'
-
-    html = f"""
+from services.mailer import RenderedEmail, mailer
+
+# Compiled once; an alert is rendered once per report, not per recipient
+ALERT_HTML = Template("""
     <!DOCTYPE html>
     <html>
       <body style='font-family: Arial, sans-serif; color: #222;'>
@@ -35,19 +25,19 @@ async def send_email_to_subscriber(email, report):
           <table style='width: 100%; border-collapse: collapse; margin: 16px 0;'>
             <tr>
               <td style='padding: 8px 0; font-weight: bold;'>Crime Type:</td>
-              <td style='padding: 8px 0;'>{crime_type}</td>
+              <td style='padding: 8px 0;'>$crime_type</td>
             </tr>
             <tr>
               <td style='padding: 8px 0; font-weight: bold;'>Location:</td>
-              <td style='padding: 8px 0;'>{location}</td>
+              <td style='padding: 8px 0;'>$location</td>
             </tr>
             <tr>
               <td style='padding: 8px 0; font-weight: bold;'>Description:</td>
-              <td style='padding: 8px 0;'>{description}</td>
+              <td style='padding: 8px 0;'>$description</td>
             </tr>
             <tr>
               <td style='padding: 8px 0; font-weight: bold;'>Date &amp; Time:</td>
-              <td style='padding: 8px 0;'>{date_time}</td>
+              <td style='padding: 8px 0;'>$date_time</td>
             </tr>
           </table>
           <p style='margin-top: 24px;'>
@@ -65,33 +55,90 @@ async def send_email_to_subscriber(email, report):
         </div>
       </body>
     </html>
-    """
+    """)
+
+ALERT_TEXT = Template("""
+    🚨 Crime Alert Notification\n\nDear Subscriber,\n\nWe want to inform you of a recent crime reported in your area. Please review the details below and stay alert.\n\nCrime Type: $crime_type\nLocation: $location\nDescription: $description\nDate & Time: $date_time\n\nSafety Tips:\n- Stay vigilant and report any suspicious activity to local authorities.\n- Share this information with your neighbors and loved ones.\n- Follow recommended safety guidelines for your area.\n\nThank you for helping keep our community safe.\nCrime Alert System Team\n    """)
+
+def render_alert(report):
+    """Render the alert for a report into a RenderedEmail shared by all its recipients."""
+    from_email = os.getenv('FROM_EMAIL', os.getenv('SMTP_USER'))
 
-    text = f"""
-    🚨 Crime Alert Notification\n\nDear Subscriber,\n\nWe want to inform you of a recent crime reported in your area. Please review the details below and stay alert.\n\nCrime Type: {crime_type}\nLocation: {location}\nDescription: {description}\nDate & Time: {date_time}\n\nSafety Tips:\n- Stay vigilant and report any suspicious activity to local authorities.\n- Share this information with your neighbors and loved ones.\n- Follow recommended safety guidelines for your area.\n\nThank you for helping keep our community safe.\nCrime Alert System Team\n    """
+    subject = f"🚨 Crime Alert: {report.get('crime_type') or 'Unknown Crime'} in {report.get('city') or 'your area'}"
+    values = alert_values(report)
 
     msg = MIMEMultipart('alternative')
-    msg['Subject'] = subject
-    msg['From'] = from_email
-    msg['To'] = email
+    msg.attach(MIMEText(ALERT_TEXT.substitute(values), 'plain'))
+    # Report fields are user input; escape them in the HTML part
+    msg.attach(MIMEText(ALERT_HTML.substitute({k: escape(str(v)) for k, v in values.items()}), 'html'))
+    return RenderedEmail(subject, msg, from_email)
 
-    part1 = MIMEText(text, 'plain')
-    part2 = MIMEText(html, 'html')
-    msg.attach(part1)
-    msg.attach(part2)
+DIGEST_HTML = Template("""
+    <!DOCTYPE html>
+    <html>
+      <body style='font-family: Arial, sans-serif; color: #222;'>
+        <div style='max-width: 500px; margin: auto; border: 1px solid #e0e0e0; border-radius: 8px; padding: 24px; background: #f9f9f9;'>
+          <h2 style='color: #1976d2; margin-top: 0;'>🚨 $count Crime Alerts in Your Area</h2>
+          <p>
+            Dear Subscriber,<br><br>
+            Several crimes were reported in your area since our last alert. Please review them below and stay alert.
+          </p>
+          <table style='width: 100%; border-collapse: collapse; margin: 16px 0;'>
+            <tr>
+              <th style='padding: 8px 0; text-align: left;'>Crime Type</th>
+              <th style='padding: 8px 0; text-align: left;'>Location</th>
+              <th style='padding: 8px 0; text-align: left;'>Date &amp; Time</th>
+            </tr>
+$rows
+          </table>
+          <p style='color: #555; font-size: 0.95em;'>
+            Thank you for helping keep our community safe.<br>
+            <b>Crime Alert System Team</b>
+          </p>
+        </div>
+      </body>
+    </html>
+    """)
 
+DIGEST_HTML_ROW = Template("""            <tr>
+              <td style='padding: 8px 0;'>$crime_type</td>
+              <td style='padding: 8px 0;'>$location</td>
+              <td style='padding: 8px 0;'>$date_time</td>
+            </tr>""")
+
+DIGEST_TEXT = Template("""
+    🚨 $count Crime Alerts in Your Area\n\nDear Subscriber,\n\nSeveral crimes were reported in your area since our last alert. Please review them below and stay alert.\n\n$rows\n\nThank you for helping keep our community safe.\nCrime Alert System Team\n    """)
+
+def alert_values(report):
+    date = report.get('date') or 'N/A'
+    time = report.get('time') or 'N/A'
+    return {
+        'crime_type': report.get('crime_type') or 'N/A',
+        'location': report.get('location') or 'N/A',
+        'description': report.get('description') or 'N/A',
+        'date_time': f"{date} {time}" if date != 'N/A' and time != 'N/A' else date or time or 'N/A',
+    }
+
+def render_digest(reports):
+    """One email listing several reports, for subscribers inside their digest window."""
+    if len(reports) == 1:
+        return render_alert(reports[0])
+    from_email = os.getenv('FROM_EMAIL', os.getenv('SMTP_USER'))
+    cities = sorted({report.get('city') or 'your area' for report in reports})
+    subject = f"🚨 {len(reports)} Crime Alerts in {', '.join(cities[:3])}"
+    rows = [alert_values(report) for report in reports]
+
+    msg = MIMEMultipart('alternative')
+    text_rows = "\n".join(f"- {r['crime_type']} at {r['location']} ({r['date_time']})" for r in rows)
+    msg.attach(MIMEText(DIGEST_TEXT.substitute(count=len(rows), rows=text_rows), 'plain'))
+    html_rows = "\n".join(DIGEST_HTML_ROW.substitute({k: escape(str(v)) for k, v in r.items()}) for r in rows)
+    msg.attach(MIMEText(DIGEST_HTML.substitute(count=len(rows), rows=html_rows), 'html'))
+    return RenderedEmail(subject, msg, from_email)
+
+async def send_email_to_subscriber(email, report):
+    # Sent over the shared connection pool instead of a new SMTP session per email
     try:
-        if smtp_port == 465:
-            with smtplib.SMTP_SSL(smtp_server, smtp_port) as server:
-                server.login(smtp_user, smtp_password)
-                server.sendmail(from_email, email, msg.as_string())
-        else:
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.ehlo()
-                server.starttls()
-                server.ehlo()
-                server.login(smtp_user, smtp_password)
-                server.sendmail(from_email, email, msg.as_string())
+        await mailer.send_raw(render_alert(report).for_recipient(email), [email])
         print(f"Crime alert email sent to {email}")
     except Exception as e:
         print(f"Failed to send email to {email}: {e}")
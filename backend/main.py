@@ -1,18 +1,54 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from routes.options import router as options_router
 from routes.prediction import router as prediction_router
+from config.database import create_indexes
+from services.dataset import crime_dataset
+from services.inference_pool import inference_pool
+from services.response_cache import response_cache
+from services.alerts import alert_outbox, sweep_pending_reports
+from services.mailer import mailer
+from services.sms import sms_gateway
+
+@asynccontextmanager
+async def lifespan(app):
+    # In the background: an unreachable Mongo must not hold up startup
+    asyncio.ensure_future(create_indexes())
+    # Load the shared crime dataset once (from the binary cache when it is fresh);
+    # at startup rather than import, so importing the app stays cheap
+    crime_dataset.load()
+    # Dashboard endpoints are answered from memory from the first request on
+    response_cache.warm()
+    # Loads and warms up the model (in every worker for a process pool)
+    inference_pool.start()
+    inference_pool.start_watcher()
+    # Warns now about a missing SMS provider; SMS jobs are then dead-lettered, nothing else stops
+    sms_gateway.setup()
+    alert_outbox.start()
+    # Queues the alerts of reports whose submit request could not
+    report_sweep = asyncio.ensure_future(sweep_pending_reports())
+    yield
+    inference_pool.shutdown()
+    # Workers first, so no send is using a connection the mailer closes
+    report_sweep.cancel()
+    await alert_outbox.stop()
+    await mailer.close()
+    await sms_gateway.close()
+
 
 app = FastAPI(
     title="Crime Prediction System",
     description="API for crime prediction, reporting, and analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -22,6 +58,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paginated map responses carry the next page's cursor in a header
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Import and include routers
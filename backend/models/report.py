@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 class CrimeReportRequest(BaseModel):
@@ -12,3 +12,7 @@ class CrimeReportRequest(BaseModel):
     victim_gender: Optional[str] = None
     weapon_used: Optional[str] = None
     crime_domain: Optional[str] = None
+    # Incident coordinates; the city centroid is used when they are missing
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    risk_level: Optional[str] = Field(None, regex="^(High|Medium|Low)$")
@@ -55,6 +55,10 @@ class SubscriptionRequest(BaseModel):
     phone: str
     email: EmailStr
     city: str
+    # Alert centre; the city centroid is used when no coordinates are given
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    radius: Optional[float] = Field(5.0, gt=0, le=50)  # Alert radius in kilometers
     notify_email: Optional[bool] = True
     notify_sms: Optional[bool] = False
     notify_high_risk: Optional[bool] = True
@@ -1,6 +1,10 @@
 from fastapi import APIRouter, HTTPException
 from models.subscriber import SubscriptionRequest
+from config.cities import geo_point
 from config.database import subscribers_collection
+from services.alerts import alert_outbox
+from services.mailer import mailer
+from services.sms import sms_gateway
 
 router = APIRouter()
 
@@ -16,13 +20,28 @@ async def subscribe(subscription: SubscriptionRequest):
         existing_phone = await subscribers_collection.find_one({"phone": subscription.phone})
         if existing_phone:
             raise HTTPException(status_code=400, detail="Phone already subscribed")
-        result = await subscribers_collection.insert_one(subscription.dict())
+        # Stored as a GeoJSON point so report alerts can find it through the 2dsphere index
+        location = geo_point(subscription.latitude, subscription.longitude, subscription.city)
+        if location is None:
+            raise HTTPException(status_code=400, detail="Unknown city; provide latitude and longitude")
+        document = subscription.dict(exclude={"latitude", "longitude"})
+        document.update(location=location, is_active=True)
+        result = await subscribers_collection.insert_one(document)
         return {"message": "Successfully subscribed to crime alerts", "subscriber_id": str(result.inserted_id)}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/outbox")
+async def outbox_status():
+    """Alert jobs per status, worker counters, the SMTP pool and the SMS gateway."""
+    try:
+        counts = await alert_outbox.status_counts()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Alert outbox unavailable: {str(e)}")
+    return {"jobs": counts, **alert_outbox.metrics(), "mailer": mailer.metrics(), "sms": sms_gateway.metrics()}
+
 @router.put("/subscribers/{subscriber_id}")
 async def update_subscription(
     subscriber_id: int,
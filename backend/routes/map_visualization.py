@@ -1,90 +1,126 @@
-from fastapi import APIRouter, HTTPException, Query
-import pandas as pd
-import os
+import re
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional
+import orjson
+from config.cities import city_coordinates
+from services.dataset import crime_dataset
+from services.incident_index import INCIDENT_COLUMNS, get_incident_index
+from services.map_tiles import MAX_ZOOM, TILE_GRID_SIZE, get_tile_grid, tile_cache
 
 router = APIRouter()
 
-# Provided city coordinates
-city_coordinates = {
-    "Agra": {"lat": 27.1752554, "lng": 78.0098161},
-    "Ahmedabad": {"lat": 23.0215374, "lng": 72.5800568},
-    "Bangalore": {"lat": 12.9767936, "lng": 77.590082},
-    "Bhopal": {"lat": 23.2584857, "lng": 77.401989},
-    "Chennai": {"lat": 13.0836939, "lng": 80.270186},
-    "Delhi": {"lat": 28.6517178, "lng": 77.2219388},
-    "Faridabad": {"lat": 28.4031478, "lng": 77.3105561},
-    "Ghaziabad": {"lat": 28.6711527, "lng": 77.4120356},
-    "Hyderabad": {"lat": 17.360589, "lng": 78.4740613},
-    "Indore": {"lat": 22.7203616, "lng": 75.8681996},
-    "Jaipur": {"lat": 26.9154576, "lng": 75.8189817},
-    "Kalyan": {"lat": 19.2396742, "lng": 73.1366482},
-    "Kanpur": {"lat": 26.4609135, "lng": 80.3217588},
-    "Kolkata": {"lat": 22.5726459, "lng": 88.3638953},
-    "Lucknow": {"lat": 26.8381, "lng": 80.9346001},
-    "Ludhiana": {"lat": 30.9090157, "lng": 75.851601},
-    "Meerut": {"lat": 28.9963296, "lng": 77.7061915},
-    "Mumbai": {"lat": 19.054999, "lng": 72.8692035},
-    "Nagpur": {"lat": 21.1498134, "lng": 79.0820556},
-    "Nashik": {"lat": 20.0112475, "lng": 73.7902364},
-    "Patna": {"lat": 25.6093239, "lng": 85.1235252},
-    "Pune": {"lat": 18.5213738, "lng": 73.8545071},
-    "Rajkot": {"lat": 22.3053263, "lng": 70.8028377},
-    "Srinagar": {"lat": 34.0747444, "lng": 74.8204443},
-    "Surat": {"lat": 21.2094892, "lng": 72.8317058},
-    "Thane": {"lat": 19.1943294, "lng": 72.9701779},
-    "Varanasi": {"lat": 25.3356491, "lng": 83.0076292},
-    "Vasai": {"lat": 19.3428238, "lng": 72.805441},
-    "Visakhapatnam": {"lat": 17.6935526, "lng": 83.2921297}
-}
-
-
-# Load the CSV once at startup
-try:
-    # Adjust the path as necessary to correctly locate your CSV file
-    csv_path = os.path.join(os.path.dirname(__file__), '..', 'crime_dataset_india.csv')
-    if not os.path.exists(csv_path):
-        # Fallback path if the above doesn't work (e.g., structure is different)
-        csv_path = os.path.join(os.path.dirname(__file__), '..', '..', 'crime_dataset_india.csv') # Go up one more level
-    
-    df = pd.read_csv(csv_path)
-    # Ensure 'Date of Occurrence' is parsed as datetime
-    df['Date of Occurrence'] = pd.to_datetime(df['Date of Occurrence'], errors='coerce')
-    df['Year'] = df['Date of Occurrence'].dt.year
-
-    # Add Latitude and Longitude based on City
-    def get_lat(city):
-        return city_coordinates.get(city, {}).get('lat')
-
-    def get_lng(city):
-        return city_coordinates.get(city, {}).get('lng')
-
-    df['Latitude'] = df['City'].apply(get_lat)
-    df['Longitude'] = df['City'].apply(get_lng)
-except FileNotFoundError:
-    print(f"Error: crime_dataset_india.csv not found at expected paths.")
-    df = pd.DataFrame() # Initialize an empty DataFrame if file not found
-except Exception as e:
-    print(f"Error loading or processing CSV: {e}")
-    df = pd.DataFrame()
+# Incidents serialized per chunk of a streamed response
+STREAM_CHUNK_ROWS = 5000
+# Largest page a client can ask for with ``limit``
+MAX_PAGE_SIZE = 50000
+
+
+def encode_cursor(position):
+    # Opaque to clients; tied to the dataset version so a reload cannot skip or repeat rows
+    return f"{crime_dataset.version[:12]}.{position}"
+
+
+def decode_cursor(cursor):
+    version, _, position = cursor.partition(".")
+    if not position.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    if version != crime_dataset.version[:12]:
+        raise HTTPException(status_code=409, detail="The dataset has changed since this cursor was issued; start again without a cursor.")
+    return int(position)
+
+
+def stream_records(index, positions):
+    # A JSON array written a chunk at a time, so the first rows go out before the rest are encoded
+    yield b"["
+    for start in range(0, len(positions), STREAM_CHUNK_ROWS):
+        chunk = orjson.dumps(index.records(positions[start:start + STREAM_CHUNK_ROWS]))[1:-1]
+        yield (b"," if start else b"") + chunk
+    yield b"]"
+
+
+def stream_ndjson(index, positions):
+    for start in range(0, len(positions), STREAM_CHUNK_ROWS):
+        records = index.records(positions[start:start + STREAM_CHUNK_ROWS])
+        yield b"".join(orjson.dumps(record) + b"\n" for record in records)
 
 
 @router.get("/crime_incidents")
 async def get_crime_incidents_on_map(
     year: int = Query(..., description="Year of crime incidents"),
-    crime_type: Optional[str] = Query(None, description="Specific crime type to filter by (optional)")
+    crime_type: Optional[str] = Query(None, description="Specific crime type to filter by (optional)"),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90, description="Bounding box south edge (optional)"),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90, description="Bounding box north edge (optional)"),
+    min_lng: Optional[float] = Query(None, ge=-180, le=180, description="Bounding box west edge (optional)"),
+    max_lng: Optional[float] = Query(None, ge=-180, le=180, description="Bounding box east edge (optional)"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; the next page's cursor is in the X-Next-Cursor header"),
+    cursor: Optional[str] = Query(None, description="Cursor returned with the previous page"),
+    format: str = Query("records", regex="^(records|ndjson|columns)$", description="records (JSON array), ndjson, or columns (parallel arrays)")
 ):
-    if df.empty:
+    index = get_incident_index()
+    if index is None:
         raise HTTPException(status_code=503, detail="Crime dataset is not available or failed to load.")
 
-    filtered_df = df[df['Year'] == year]
+    bbox = None
+    edges = (min_lat, max_lat, min_lng, max_lng)
+    if any(edge is not None for edge in edges):
+        if any(edge is None for edge in edges):
+            raise HTTPException(status_code=400, detail="A bounding box needs min_lat, max_lat, min_lng and max_lng.")
+        if min_lat > max_lat or min_lng > max_lng:
+            raise HTTPException(status_code=400, detail="Bounding box minimums must not exceed its maximums.")
+        bbox = edges
+
+    try:
+        # Incidents missing lat/lon (a city not in city_coordinates) are never in the index
+        positions = index.query(year, crime_type, bbox, after=decode_cursor(cursor) if cursor else -1)
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid crime_type: {str(e)}")
+
+    headers = {}
+    if limit is not None and len(positions) > limit:
+        positions = positions[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(positions[-1])
+
+    if format == "columns":
+        payload = index.columns(positions)
+        payload["next_cursor"] = headers.get("X-Next-Cursor")
+        return Response(content=orjson.dumps(payload), media_type="application/json", headers=headers)
+    if format == "ndjson":
+        return StreamingResponse(stream_ndjson(index, positions), media_type="application/x-ndjson", headers=headers)
+    return StreamingResponse(stream_records(index, positions), media_type="application/json", headers=headers)
+
+
+def tile_data(z, x, y, year=None, crime_type=None, grid=TILE_GRID_SIZE):
+    tile_grid = get_tile_grid()
+    if tile_grid is None:
+        return {"z": z, "x": x, "y": y, "grid": grid, "count": 0, "cells": []}
+    return tile_grid.tile(z, x, y, year, crime_type, grid)
+
+
+@router.get("/tiles/{z}/{x}/{y}")
+async def get_crime_tile(
+    request: Request,
+    z: int = Path(..., ge=0, le=MAX_ZOOM, description="Zoom level"),
+    x: int = Path(..., ge=0, description="Tile column"),
+    y: int = Path(..., ge=0, description="Tile row"),
+    year: Optional[int] = Query(None, description="Year of crime incidents (optional, default all years)"),
+    crime_type: Optional[str] = Query(None, description="Specific crime type to filter by (optional)"),
+    grid: int = Query(TILE_GRID_SIZE, ge=1, le=64, description="Cells per tile side")
+):
+    """Incident counts and crime types per cell of a Web Mercator (slippy map) tile."""
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=400, detail=f"Tile {x}/{y} does not exist at zoom {z}.")
+    params = {"z": z, "x": x, "y": y, "year": year, "crime_type": crime_type, "grid": grid}
+    try:
+        # The payload depends on the viewport and grid only, so tiles are cached per dataset version
+        return tile_cache.respond(request, "map_tile", tile_data, params)
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid crime_type: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    if crime_type:
-        filtered_df = filtered_df[filtered_df['Crime Description'].str.contains(crime_type, case=False, na=False)]
 
-    # Select relevant columns and drop rows with missing lat/lon
-    # (missing lat/lon will occur if a city in the CSV is not in city_coordinates)
-    map_data = filtered_df[['Latitude', 'Longitude', 'Crime Description', 'City', 'Date of Occurrence']].copy()
-    map_data.dropna(subset=['Latitude', 'Longitude'], inplace=True)
-    
-    return map_data.to_dict(orient='records')
+@router.get("/tiles/cache")
+async def tile_cache_metrics():
+    """Entries, size and hit counters of the map tile cache."""
+    return tile_cache.metrics()
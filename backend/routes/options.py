@@ -1,30 +1,21 @@
 from fastapi import APIRouter
-import pandas as pd
-import os
+from services.bucketing import AGE_GROUP_OPTIONS, TIME_OF_DAY_OPTIONS
+from services.dataset import crime_dataset
 
 router = APIRouter()
 
-# Load the CSV once at startup
-csv_path = os.path.join(os.path.dirname(__file__), '..', 'crime_dataset_india.csv')
-df = pd.read_csv(csv_path)
-# Ensure 'Date of Occurrence' is parsed as datetime and 'Year' column exists
-df['Date of Occurrence'] = pd.to_datetime(df['Date of Occurrence'], errors='coerce')
-df['Year'] = df['Date of Occurrence'].dt.year
-
 @router.get("/api/options")
 def get_options():
-    age_groups = [
-        {"value": "0-18", "label": "0–18 (Child/Teen)"},
-        {"value": "19-25", "label": "19–25 (Young Adult)"},
-        {"value": "26-35", "label": "26–35 (Adult)"},
-        {"value": "36-50", "label": "36–50 (Middle-aged)"},
-        {"value": "50+", "label": "50+ (Senior)"}
-    ]
+    df = crime_dataset.df
+    age_groups = AGE_GROUP_OPTIONS
     genders = [
         {"value": "M", "label": "Male"},
         {"value": "F", "label": "Female"},
         {"value": "O", "label": "Other"}
     ]
+    if df.empty:
+        return {"cities": [], "crimeTypes": [], "ageGroups": age_groups, "timesOfDay": TIME_OF_DAY_OPTIONS, "genders": genders, "years": []}
+
     # Prepare city options as value-label pairs
     cities = sorted(df['City'].dropna().unique().tolist())
     city_options = [{"value": city, "label": city} for city in cities]
@@ -36,6 +27,7 @@ def get_options():
         "cities": city_options,
         "crimeTypes": sorted(df['Crime Description'].dropna().unique().tolist()),
         "ageGroups": age_groups,
+        "timesOfDay": TIME_OF_DAY_OPTIONS,
         "genders": genders,
         "years": dataset_years, # Add years to the response
     }
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, HTTPException
+import os
+import secrets
+from fastapi import APIRouter, Header, HTTPException
 from pydantic import BaseModel
-from services.prediction import predict_crime_type
+from typing import List, Optional
+from services.inference_pool import inference_pool
+from services.micro_batcher import prediction_batcher
+from services.prediction import predict_crime_types
 
 router = APIRouter()
 
@@ -12,26 +17,71 @@ class PredictionInput(BaseModel):
     month: str
     day_of_week: str
 
+class BatchPredictionInput(BaseModel):
+    inputs: List[PredictionInput]
+    top_k: int = 3
+
+class ReloadInput(BaseModel):
+    version: Optional[str] = None
+
+# Upper bound on rows per batch request, e.g. a full city x time x weekday grid
+MAX_BATCH_SIZE = int(os.getenv("PREDICTION_MAX_BATCH_SIZE", 50000))
+# POST /reload requires a matching X-Admin-Token header; it is refused while this is unset
+ADMIN_TOKEN = os.getenv("PREDICTION_ADMIN_TOKEN")
+
 @router.post("/")
 async def predict(input: PredictionInput):
     try:
-        result = predict_crime_type(
-            input.city,
-            input.age_group,
-            input.gender,
-            input.time_of_day,
-            input.month,
-            input.day_of_week
-        )
-        print("Prediction result:", result)  # Debug log
+        # Concurrent requests are scored together in the prediction pool
+        result = await prediction_batcher.predict(input.dict())
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         print("Prediction error:", e)  # Debug log
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/batch")
+async def predict_batch(batch: BatchPredictionInput):
+    """Score many inputs with one model call; invalid rows get an "error" entry."""
+    if len(batch.inputs) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch too large: at most {MAX_BATCH_SIZE} inputs")
+    if batch.top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k must be at least 1")
+    results = await inference_pool.run(predict_crime_types, [item.dict() for item in batch.inputs], batch.top_k)
+    if isinstance(results, dict):
+        raise HTTPException(status_code=500, detail=results["error"])
+    return {"predictions": results}
+
+
+@router.post("/reload")
+async def reload_model(reload: ReloadInput = ReloadInput(), x_admin_token: Optional[str] = Header(None)):
+    """Load a model version (CURRENT by default) and swap it in without dropping requests.
+
+    Naming a version also makes it the CURRENT one.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model reload is disabled; set PREDICTION_ADMIN_TOKEN to enable it")
+    if not secrets.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    try:
+        version = await inference_pool.reload(reload.version, make_current=bool(reload.version))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {str(e)}")
+    return {"status": "reloaded", "version": version}
+
+
+@router.get("/metrics")
+async def prediction_metrics():
+    """Queue depth and counters of the prediction pool and the micro-batcher."""
+    return {**inference_pool.metrics(), "batching": prediction_batcher.metrics()}
+
+
 # @router.post("/")
 # async def predict(input: PredictionInput):
 #     try:
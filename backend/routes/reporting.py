@@ -1,39 +1,27 @@
 from fastapi import APIRouter, HTTPException
-from config.database import crimes_collection, subscribers_collection
+from config.cities import geo_point
+from config.database import crimes_collection
 from models.report import CrimeReportRequest
-import asyncio
-from config.email import send_email_to_subscriber
+from services.alerts import queue_report_alerts
 
 router = APIRouter()
 
-async def send_email(email, report):
-    subject = f"Crime Alert: {report['crime_type']} reported in {report['city']}"
-    body = f"""
-    <h3>Crime Alert Notification</h3>
-    <b>Type:</b> {report['crime_type']}<br>
-    <b>Location:</b> {report['location']}<br>
-    <b>Description:</b> {report['description']}<br>
-    <b>Date/Time:</b> {report['date']} {report['time']}<br>
-    """
-    await send_email_to_subscriber(email, report)
-
-async def send_sms(phone, report):
-    # Your SMS sending logic here
-    pass
-
-async def alert_subscribers(report):
-    subscribers = subscribers_collection.find({})
-    tasks = []
-    async for subscriber in subscribers:
-        if subscriber.get("email"):
-            tasks.append(send_email(subscriber["email"], report))
-    await asyncio.gather(*tasks)
-
 @router.post("/submit")
 async def submit_report(report: CrimeReportRequest):
-    # Save the report
-    result = await crimes_collection.insert_one(report.dict())
-    await alert_subscribers(report.dict())
+    # Save the report with the incident point used for geo-targeted alerts
+    document = report.dict()
+    point = geo_point(report.latitude, report.longitude, report.city)
+    if point is not None:
+        document["geo"] = point
+    # Cleared once the alerts are queued; the periodic sweep queues any report left flagged
+    document["alerts_pending"] = True
+    result = await crimes_collection.insert_one(document)
+    # Alerts go through the durable outbox; the workers fan out and send them
+    try:
+        await queue_report_alerts(result.inserted_id, document)
+    except Exception as e:
+        # The report is stored: answer success so the client does not submit it again
+        print(f"Could not queue alerts for report {result.inserted_id}, the sweep will: {str(e)}")
     return {"success": True, "report_id": str(result.inserted_id)}
 
 @router.get("/reports/{report_id}")
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pymongo import UpdateOne
+
+from config.cities import city_point
+from config.database import sync_db
+
+# Subscribers created before alerts were geo-targeted have no location yet;
+# give them their city's centroid so the $geoNear query can reach them
+updates = []
+unknown = 0
+for subscriber in sync_db.subscribers.find({"location": {"$exists": False}}, {"city": 1}):
+    point = city_point(subscriber.get("city"))
+    if point is None:
+        unknown += 1
+        continue
+    updates.append(UpdateOne({"_id": subscriber["_id"]}, {"$set": {"location": point}}))
+
+if updates:
+    sync_db.subscribers.bulk_write(updates, ordered=False)
+print(f"Set location for {len(updates)} subscriber(s); {unknown} with an unknown city were left unchanged")
@@ -0,0 +1,39 @@
+import argparse
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+from services import dataset_cache
+from services.dataset import SCHEMA_VERSION, find_csv_path, preprocess
+
+parser = argparse.ArgumentParser(description="Build the memory-mappable cache of the preprocessed crime dataset")
+parser.add_argument('--csv', default=None, help="Path to crime_dataset_india.csv (defaults to the server's lookup)")
+parser.add_argument('--cache-dir', default=dataset_cache.CACHE_DIR, help="Directory the cache is written to")
+parser.add_argument('--force', action='store_true', help="Rebuild even if the existing cache is fresh")
+args = parser.parse_args()
+
+csv_path = args.csv or find_csv_path()
+if csv_path is None:
+    sys.exit("Could not find crime_dataset_india.csv; pass --csv")
+
+if not args.force and dataset_cache.fresh_manifest(csv_path, SCHEMA_VERSION, args.cache_dir):
+    print(f"Cache in {args.cache_dir} is up to date for {csv_path}")
+    sys.exit(0)
+
+start = time.perf_counter()
+df = preprocess(pd.read_csv(csv_path))
+parsed = time.perf_counter()
+if args.force:
+    manifest = dataset_cache.read_manifest(args.cache_dir)
+    if manifest:
+        shutil.rmtree(os.path.join(args.cache_dir, manifest["data_dir"]), ignore_errors=True)
+manifest = dataset_cache.write_cache(df, csv_path, SCHEMA_VERSION, args.cache_dir)
+written = time.perf_counter()
+
+print(f"Parsed {manifest['rows']} rows in {parsed - start:.2f}s, wrote cache in {written - parsed:.2f}s")
+print(f"Cache directory: {os.path.join(args.cache_dir, manifest['data_dir'])}")
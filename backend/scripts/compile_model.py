@@ -0,0 +1,35 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import joblib
+
+from services import forest, model_store, probability_table
+from services.prediction import FEATURE_ORDER
+
+parser = argparse.ArgumentParser(description="Precompute predict_proba for every possible prediction input")
+parser.add_argument('--version', default=None, help="Model version to compile (defaults to CURRENT)")
+parser.add_argument('--model', default=None, help="Path to crime_predictor.pkl; its .forest export is used when present (overrides --version)")
+parser.add_argument('--encoders', default=None, help="Path to label_encoders.pkl (overrides --version)")
+parser.add_argument('--dtype', default='float32', choices=['float32', 'float16'], help="Storage type of the table")
+args = parser.parse_args()
+
+_, model_path, encoders_path = model_store.model_files(args.version)
+args.model = args.model or model_path
+args.encoders = args.encoders or encoders_path
+
+start = time.perf_counter()
+# Same model (and hash) the server loads, so it accepts the table instead of rebuilding it
+model, model_sha256 = forest.load_model(args.model)
+label_encoders = joblib.load(args.encoders)
+loaded = time.perf_counter()
+table = probability_table.build_table(model, label_encoders, FEATURE_ORDER, args.dtype)
+built = time.perf_counter()
+probability_table.save_table(table, args.model, FEATURE_ORDER, model_sha256=model_sha256)
+
+table_path, _ = probability_table.table_paths(args.model)
+print(f"Loaded model in {loaded - start:.2f}s, scored {table[..., 0].size} inputs in {built - loaded:.2f}s")
+print(f"Wrote {table.nbytes / 1e6:.1f} MB table to {table_path}")
@@ -0,0 +1,32 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import joblib
+
+from services import forest, model_store
+
+parser = argparse.ArgumentParser(description="Export a pickled RandomForest as memory-mappable node arrays")
+parser.add_argument('--version', default=None, help="Model version to export (defaults to CURRENT)")
+parser.add_argument('--model', default=None, help="Path to crime_predictor.pkl (overrides --version)")
+parser.add_argument('--value-dtype', default='float32', choices=['float64', 'float32', 'float16'],
+                    help="Storage type of the leaf probabilities")
+args = parser.parse_args()
+
+model_path = args.model or model_store.model_files(args.version)[1]
+if not os.path.exists(model_path) and os.path.isdir(forest.forest_dir(model_path)):
+    # Incremental versions are published as a forest export only
+    print(f"{forest.forest_dir(model_path)} is already exported and there is no pickle to export from")
+    sys.exit(0)
+
+start = time.perf_counter()
+model = joblib.load(model_path)
+loaded = time.perf_counter()
+meta = forest.export_forest(model, forest.forest_dir(model_path), args.value_dtype)
+exported = time.perf_counter()
+
+print(f"Unpickled {model_path} in {loaded - start:.2f}s, exported in {exported - loaded:.2f}s")
+print(f"{meta['n_trees']} trees, {meta['n_nodes']} nodes, {meta['n_leaves']} leaves -> {forest.forest_dir(model_path)}")
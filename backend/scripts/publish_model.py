@@ -0,0 +1,20 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services import model_store
+
+parser = argparse.ArgumentParser(description="Copy a trained model into the versioned model directory")
+parser.add_argument('--model', default=os.path.join(model_store.MODEL_DIR, model_store.MODEL_FILE), help="Path to crime_predictor.pkl")
+parser.add_argument('--encoders', default=os.path.join(model_store.MODEL_DIR, model_store.ENCODERS_FILE), help="Path to label_encoders.pkl")
+parser.add_argument('--version', default=None, help="Version name (defaults to a timestamp)")
+parser.add_argument('--model-dir', default=model_store.MODEL_DIR, help="Versioned model directory")
+parser.add_argument('--no-activate', action='store_true', help="Copy the files but leave CURRENT unchanged")
+args = parser.parse_args()
+
+version = model_store.publish(args.model, args.encoders, args.version, args.model_dir, make_current=not args.no_activate)
+print(f"Published model version {version} to {model_store.versions_dir(args.model_dir)}")
+if not args.no_activate:
+    print("CURRENT now points to it; running servers pick it up on their next poll or POST /api/prediction/reload")
@@ -0,0 +1,28 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config.database import sync_db
+
+parser = argparse.ArgumentParser(description="Put dead-lettered alert jobs back in the queue")
+parser.add_argument('--kind', choices=['report', 'email', 'email_batch', 'email_digest', 'sms', 'sms_digest'], default=None, help="Only requeue jobs of this kind")
+parser.add_argument('--list', action='store_true', help="Show the dead jobs and their last error instead")
+args = parser.parse_args()
+
+query = {"status": "dead"}
+if args.kind:
+    query["kind"] = args.kind
+
+if args.list:
+    for job in sync_db.alert_outbox.find(query, {"attempts": 1, "last_error": 1, "failed_at": 1}):
+        print(f"{job['_id']}  attempts={job.get('attempts')}  failed_at={job.get('failed_at')}  {job.get('last_error')}")
+else:
+    # Attempts restart from zero so each job gets the full retry schedule again
+    result = sync_db.alert_outbox.update_many(query, {
+        "$set": {"status": "pending", "attempts": 0, "next_attempt_at": datetime.utcnow()},
+        "$unset": {"failed_at": ""},
+    })
+    print(f"Requeued {result.modified_count} dead alert job(s)")
@@ -0,0 +1,37 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config.database import sync_db
+from services.retraining import retrain_incremental
+
+parser = argparse.ArgumentParser(description="Add trees trained on newly reported crimes and publish a new model version")
+parser.add_argument('--base-version', default=None, help="Version to extend (defaults to CURRENT)")
+parser.add_argument('--n-estimators', type=int, default=20, help="Trees fitted on the new reports")
+parser.add_argument('--min-reports', type=int, default=50, help="Skip retraining below this many usable new reports")
+parser.add_argument('--version', default=None, help="Name of the new version (defaults to a timestamp)")
+parser.add_argument('--no-activate', action='store_true', help="Publish without pointing CURRENT at the new version")
+parser.add_argument('--n-jobs', type=int, default=-1)
+args = parser.parse_args()
+
+start = time.perf_counter()
+summary = retrain_incremental(
+    sync_db.crimes,
+    base_version=args.base_version,
+    n_estimators=args.n_estimators,
+    min_reports=args.min_reports,
+    version=args.version,
+    make_current=not args.no_activate,
+    n_jobs=args.n_jobs,
+)
+elapsed = time.perf_counter() - start
+
+print(f"{summary['reports']} new report(s) since {summary['base_version'] or 'the base model'}: "
+      f"{summary['used']} used, {summary['skipped']} skipped")
+if summary["version"] is None:
+    print(f"Fewer than {args.min_reports} usable reports; nothing published ({elapsed:.1f}s)")
+else:
+    print(f"Published model version {summary['version']} in {elapsed:.1f}s")
@@ -1,113 +1,235 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import joblib
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score
+from joblib import Parallel, delayed
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, f1_score
-import joblib
-import os
-import numpy as np
+from sklearn.model_selection import train_test_split, StratifiedKFold
+from sklearn.preprocessing import LabelEncoder
+
+from services import bucketing, forest, model_store
+from services.dataset import find_csv_path
+from services.dataset_cache import file_sha256
+
+backend_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+parser = argparse.ArgumentParser(description="Train the crime type predictor")
+parser.add_argument('--data', default=None, help="Path to crime_dataset_india.csv (defaults to the server's lookup)")
+parser.add_argument('--output-dir', default=model_store.MODEL_DIR, help="Where crime_predictor.pkl and label_encoders.pkl are written")
+parser.add_argument('--n-estimators', default='100,200,300', help="Comma-separated forest sizes to compare")
+parser.add_argument('--folds', type=int, default=5, help="Cross-validation folds for the chosen forest size")
+parser.add_argument('--n-jobs', type=int, default=-1, help="Parallel workers (-1 = all cores)")
+parser.add_argument('--min-crime-count', type=int, default=50, help="Drop crime types with at most this many rows")
+parser.add_argument('--seed', type=int, default=42)
+parser.add_argument('--cache-dir', default=os.path.join(backend_dir, 'cache', 'training'),
+                    help="Where search and fold scores are kept so an interrupted run can resume")
+parser.add_argument('--no-cache', action='store_true', help="Ignore and do not write cached scores")
+parser.add_argument('--publish', action='store_true', help="Also publish the model as a new version and make it CURRENT")
+parser.add_argument('--version', default=None, help="Version name used with --publish (defaults to a timestamp)")
+args = parser.parse_args()
+
+timings = {}
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    yield
+    timings[name] = timings.get(name, 0) + time.perf_counter() - start
+    print(f"[{name}] {timings[name]:.1f}s")
+
+
+def score_path(key):
+    return None if args.no_cache else os.path.join(args.cache_dir, key + '.json')
+
+
+def read_score(key):
+    path = score_path(key)
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)["score"]
+
+
+def write_score(path, score):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({"score": score}, f)
+    os.replace(path + '.tmp', path)
+
+
+def new_forest(n_estimators, n_jobs):
+    return RandomForestClassifier(n_estimators=n_estimators, class_weight='balanced',
+                                  random_state=args.seed, n_jobs=n_jobs)
+
+
+def fit_and_score(features, target, n_estimators, train_index, test_index, n_jobs, path):
+    clf = new_forest(n_estimators, n_jobs)
+    clf.fit(features[train_index], target[train_index])
+    score = float(f1_score(target[test_index], clf.predict(features[test_index]), average='weighted'))
+    # Saved by the worker itself so finished tasks survive an interrupted run
+    if path is not None:
+        write_score(path, score)
+    return score
+
+
+def run_tasks(tasks):
+    """Score (key, n_estimators, train_index, test_index) tasks in parallel, reusing cached scores.
+
+    A rerun after an interruption only redoes the unfinished tasks. Cores are split between the pending
+    tasks, so each forest also builds its trees in parallel when there are
+    fewer tasks than cores.
+    """
+    scores = {key: read_score(key) for key, _, _, _ in tasks}
+    pending = [task for task in tasks if scores[task[0]] is None]
+    if len(pending) < len(tasks):
+        print(f"Resumed {len(tasks) - len(pending)} cached result(s)")
+    if pending:
+        cores = joblib.cpu_count() if args.n_jobs < 0 else args.n_jobs
+        workers = min(len(pending), cores)
+        inner_jobs = max(1, cores // workers)
+        results = Parallel(n_jobs=workers)(
+            delayed(fit_and_score)(features, target, n, train_index, test_index, inner_jobs, score_path(key))
+            for key, n, train_index, test_index in pending
+        )
+        for (key, _, _, _), score in zip(pending, results):
+            scores[key] = score
+    return [scores[key] for key, _, _, _ in tasks]
+
+
+data_path = args.data or find_csv_path()
+if data_path is None:
+    sys.exit("Could not find crime_dataset_india.csv; pass --data")
+candidates = [int(n) for n in args.n_estimators.split(',')]
+total_start = time.perf_counter()
+
+with stage("load"):
+    df = pd.read_csv(data_path)
+    # Cached scores are only reused for the same data and preprocessing settings
+    fingerprint = hashlib.sha256(
+        f"{file_sha256(data_path)}-{args.min_crime_count}-{args.seed}".encode()
+    ).hexdigest()[:16]
+
+with stage("features"):
+    # Use only 2020-2024 for training
+    df['Date of Occurrence'] = pd.to_datetime(df['Date of Occurrence'], errors='coerce')
+    df = df[df['Date of Occurrence'].dt.year.between(2020, 2024)]
+
+    df['Month'] = df['Date of Occurrence'].dt.month.astype(str)
+    df['Hour'] = pd.to_datetime(df['Time of Occurrence'], errors='coerce').dt.hour
+    # Same buckets the API uses for analysis and prediction inputs
+    df['TimeOfDay'] = bucketing.time_of_day(df['Hour'])
+    df['DayOfWeek'] = df['Date of Occurrence'].dt.day_name()
+    df['AgeGroup'] = bucketing.age_group(df['Victim Age'])
+
+    print("Unique AgeGroup values:", df['AgeGroup'].unique())
+    print("Unique TimeOfDay values:", df['TimeOfDay'].unique())
+    print("Unique Gender values:", df['Victim Gender'].unique())
+    print("Unique Month values:", df['Month'].unique())
+    print("Unique DayOfWeek values:", df['DayOfWeek'].unique())
+
+    # Drop rows with missing values in required columns
+    df = df.dropna(subset=['City', 'AgeGroup', 'Victim Gender', 'TimeOfDay', 'Month', 'Crime Description', 'DayOfWeek'])
+
+    # Remove rare crime types (optional, for better accuracy)
+    crime_counts = df['Crime Description'].value_counts()
+    common_crimes = crime_counts[crime_counts > args.min_crime_count].index
+    df = df[df['Crime Description'].isin(common_crimes)]
+
+with stage("encode"):
+    le_city = LabelEncoder()
+    le_age_group = LabelEncoder()
+    le_gender = LabelEncoder()
+    le_time_of_day = LabelEncoder()
+    le_month = LabelEncoder()
+    le_day_of_week = LabelEncoder()
+    le_crime = LabelEncoder()
+
+    df['City_enc'] = le_city.fit_transform(df['City'])
+    df['AgeGroup_enc'] = le_age_group.fit_transform(df['AgeGroup'])
+    df['Gender_enc'] = le_gender.fit_transform(df['Victim Gender'])
+    df['TimeOfDay_enc'] = le_time_of_day.fit_transform(df['TimeOfDay'])
+    df['Month_enc'] = le_month.fit_transform(df['Month'])
+    df['DayOfWeek_enc'] = le_day_of_week.fit_transform(df['DayOfWeek'])
+    df['Crime_enc'] = le_crime.fit_transform(df['Crime Description'])
+
+    features = df[['City_enc', 'AgeGroup_enc', 'Gender_enc', 'TimeOfDay_enc', 'Month_enc', 'DayOfWeek_enc']].to_numpy()
+    target = df['Crime_enc'].to_numpy()
+
+    # Split data
+    train_index, test_index = train_test_split(np.arange(len(df)), test_size=0.2,
+                                               random_state=args.seed, stratify=target)
+
+with stage("search"):
+    # Every forest size is fitted on the training split and scored on the test split
+    scores = run_tasks([(f"search-{fingerprint}-n{n}", n, train_index, test_index) for n in candidates])
+    for n, score in zip(candidates, scores):
+        print(f"n_estimators={n}: weighted F1 {score:.3f}")
+    best_n = candidates[int(np.argmax(scores))]
+    print(f"Best n_estimators: {best_n}")
+
+with stage("cross-validation"):
+    cv = StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=args.seed)
+    cv_scores = run_tasks([
+        (f"cv-{fingerprint}-n{best_n}-fold{i}of{args.folds}", best_n, fold_train, fold_test)
+        for i, (fold_train, fold_test) in enumerate(cv.split(features, target))
+    ])
+    print(f"Cross-validated F1 score: {np.mean(cv_scores):.3f} (+/- {np.std(cv_scores):.3f})")
+
+with stage("final fit"):
+    best_model = new_forest(best_n, args.n_jobs)
+    best_model.fit(features[train_index], target[train_index])
+    # Serving predicts a few rows at a time; a thread pool per call would only add overhead
+    best_model.set_params(n_jobs=None)
+
+with stage("evaluate"):
+    y_test = target[test_index]
+    y_pred = best_model.predict(features[test_index])
+    print('Accuracy:', accuracy_score(y_test, y_pred))
+    print('F1 Score:', f1_score(y_test, y_pred, average='weighted'))
+    print('Classification Report:')
+    print(classification_report(y_test, y_pred, target_names=le_crime.classes_))
+    print('Confusion Matrix:')
+    print(confusion_matrix(y_test, y_pred))
+
+with stage("save"):
+    os.makedirs(args.output_dir, exist_ok=True)
+    model_path = os.path.join(args.output_dir, model_store.MODEL_FILE)
+    encoders_path = os.path.join(args.output_dir, model_store.ENCODERS_FILE)
+    joblib.dump(best_model, model_path)
+    label_encoders = {
+        'city': le_city,
+        'age_group': le_age_group,
+        'gender': le_gender,
+        'time_of_day': le_time_of_day,
+        'month': le_month,
+        'day_of_week': le_day_of_week,
+        'crime': le_crime
+    }
+    joblib.dump(label_encoders, encoders_path)
+    # Flattened copy of the trees that the API memory-maps instead of unpickling
+    forest.export_forest(best_model, forest.forest_dir(model_path))
+    if args.publish:
+        version = model_store.publish(model_path, encoders_path, args.version)
+        print(f"Published model version {version}")
 
-# Load data
-df = pd.read_csv(r'C:\Users\Admin\Desktop\CRP - Copy\srcc\backend\crime_dataset_india.csv')
-
-# Use only 2020-2024 for training
-df['Date of Occurrence'] = pd.to_datetime(df['Date of Occurrence'], errors='coerce')
-df = df[df['Date of Occurrence'].dt.year.between(2020, 2024)]
-
-# Feature engineering
-df['Month'] = df['Date of Occurrence'].dt.month.astype(str)
-df['Hour'] = pd.to_datetime(df['Time of Occurrence'], errors='coerce').dt.hour
-df['TimeOfDay'] = pd.cut(
-    df['Hour'],
-    bins=[-1, 5, 11, 17, 21, 24],
-    labels=['Night', 'Morning', 'Afternoon', 'Evening', 'Night2']
-)
-df['TimeOfDay'] = df['TimeOfDay'].replace('Night2', 'Night')
-df['DayOfWeek'] = df['Date of Occurrence'].dt.day_name()
-
-# Bin Victim Age
-bins = [0, 18, 30, 45, 60, 120]
-labels = ['0-18', '19-30', '31-45', '46-60', '60+']
-df['AgeGroup'] = pd.cut(pd.to_numeric(df['Victim Age'], errors='coerce'), bins=bins, labels=labels, right=False)
-
-print("Unique AgeGroup values:", df['AgeGroup'].unique())
-print("Unique TimeOfDay values:", df['TimeOfDay'].unique())
-print("Unique Gender values:", df['Victim Gender'].unique())
-print("Unique Month values:", df['Month'].unique())
-print("Unique DayOfWeek values:", df['DayOfWeek'].unique())
-
-# Drop rows with missing values in required columns
-df = df.dropna(subset=['City', 'AgeGroup', 'Victim Gender', 'TimeOfDay', 'Month', 'Crime Description', 'DayOfWeek'])
-
-# Remove rare crime types (optional, for better accuracy)
-crime_counts = df['Crime Description'].value_counts()
-common_crimes = crime_counts[crime_counts > 50].index
-df = df[df['Crime Description'].isin(common_crimes)]
-
-# Encode features
-le_city = LabelEncoder()
-le_age_group = LabelEncoder()
-le_gender = LabelEncoder()
-le_time_of_day = LabelEncoder()
-le_month = LabelEncoder()
-le_day_of_week = LabelEncoder()
-le_crime = LabelEncoder()
-
-df['City_enc'] = le_city.fit_transform(df['City'])
-df['AgeGroup_enc'] = le_age_group.fit_transform(df['AgeGroup'])
-df['Gender_enc'] = le_gender.fit_transform(df['Victim Gender'])
-df['TimeOfDay_enc'] = le_time_of_day.fit_transform(df['TimeOfDay'])
-df['Month_enc'] = le_month.fit_transform(df['Month'])
-df['DayOfWeek_enc'] = le_day_of_week.fit_transform(df['DayOfWeek'])
-df['Crime_enc'] = le_crime.fit_transform(df['Crime Description'])
-
-X = df[['City_enc', 'AgeGroup_enc', 'Gender_enc', 'TimeOfDay_enc', 'Month_enc', 'DayOfWeek_enc']]
-y = df['Crime_enc']
-
-# Split data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-
-# Model with hyperparameter tuning (simple grid)
-best_score = 0
-best_model = None
-for n in [100, 200, 300]:
-    clf = RandomForestClassifier(n_estimators=n, class_weight='balanced', random_state=42)
-    clf.fit(X_train, y_train)
-    y_pred = clf.predict(X_test)
-    score = f1_score(y_test, y_pred, average='weighted')
-    if score > best_score:
-        best_score = score
-        best_model = clf
-
-# Cross-validation
-cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-cv_scores = cross_val_score(best_model, X, y, cv=cv, scoring='f1_weighted')
-print(f"Cross-validated F1 score: {np.mean(cv_scores):.3f} (+/- {np.std(cv_scores):.3f})")
-
-# Final evaluation
-y_pred = best_model.predict(X_test)
-print('Accuracy:', accuracy_score(y_test, y_pred))
-print('F1 Score:', f1_score(y_test, y_pred, average='weighted'))
-print('Classification Report:')
-print(classification_report(y_test, y_pred, target_names=le_crime.classes_))
-print('Confusion Matrix:')
-print(confusion_matrix(y_test, y_pred))
-
-# Save model and encoders
-os.makedirs('models', exist_ok=True)
-joblib.dump(best_model, 'models/crime_predictor.pkl')
-label_encoders = {
-    'city': le_city,
-    'age_group': le_age_group,
-    'gender': le_gender,
-    'time_of_day': le_time_of_day,
-    'month': le_month,
-    'day_of_week': le_day_of_week,
-    'crime': le_crime
-}
-joblib.dump(label_encoders, 'models/label_encoders.pkl')
 print("Label encoder classes (age_group):", le_age_group.classes_)
 print("Label encoder classes (time_of_day):", le_time_of_day.classes_)
 print("Label encoder classes (gender):", le_gender.classes_)
 print("Label encoder classes (month):", le_month.classes_)
-print("Label encoder classes (day_of_week):", le_day_of_week.classes_)
\ No newline at end of file
+print("Label encoder classes (day_of_week):", le_day_of_week.classes_)
+
+print("\nTiming breakdown:")
+for name, seconds in timings.items():
+    print(f"  {name:<18} {seconds:8.1f}s")
+print(f"  {'total':<18} {time.perf_counter() - total_start:8.1f}s")
@@ -0,0 +1,208 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+ALERT_WORKERS = int(os.getenv("ALERT_WORKERS", 4))
+ALERT_MAX_ATTEMPTS = int(os.getenv("ALERT_MAX_ATTEMPTS", 6))
+# Retry n waits about BASE * 2**(n-1) seconds, at most MAX
+ALERT_RETRY_BASE_SECONDS = float(os.getenv("ALERT_RETRY_BASE_SECONDS", 10))
+ALERT_RETRY_MAX_SECONDS = float(os.getenv("ALERT_RETRY_MAX_SECONDS", 3600))
+# A claimed job whose worker died becomes available again after this long
+ALERT_LEASE_SECONDS = float(os.getenv("ALERT_LEASE_SECONDS", 300))
+# Idle workers look for due jobs (retries, other processes' jobs) this often
+ALERT_POLL_SECONDS = float(os.getenv("ALERT_POLL_SECONDS", 1))
+
+
+class PermanentError(Exception):
+    """Raised by a handler when retrying cannot help; the job is dead-lettered at once."""
+
+
+def retry_delay(attempts):
+    delay = min(ALERT_RETRY_BASE_SECONDS * 2 ** (attempts - 1), ALERT_RETRY_MAX_SECONDS)
+    # Jitter keeps jobs that failed together from retrying together
+    return delay * random.uniform(0.8, 1.2)
+
+
+class AlertOutbox:
+    """Durable job queue in a Mongo collection, worked by coroutines in every API process.
+
+    A job is a document ``{_id, kind, payload, status, attempts,
+    next_attempt_at, ...}``; its ``_id`` is the idempotency key, so enqueuing
+    the same key twice does nothing. Workers claim due jobs atomically with
+    find_one_and_update and run ``handlers[kind](payload, job_id)``. A failure
+    schedules a retry with exponential backoff; after ``max_attempts`` (or a
+    PermanentError) the job is left with status "dead" and its last error.
+
+    A claimed job carries a lease in ``next_attempt_at``: if the process
+    dies while sending, another worker picks the job up when the lease
+    expires. Delivery is therefore at-least-once.
+    """
+
+    def __init__(self, collection, handlers=None, workers=ALERT_WORKERS, max_attempts=ALERT_MAX_ATTEMPTS,
+                 lease_seconds=ALERT_LEASE_SECONDS, poll_seconds=ALERT_POLL_SECONDS):
+        self.collection = collection
+        self.handlers = dict(handlers or {})
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.lease = timedelta(seconds=lease_seconds)
+        self.poll_seconds = poll_seconds
+        self.tasks = []
+        self.wakeup = None
+        self.stopping = False
+        self.processed = 0
+        self.retried = 0
+        self.dead = 0
+
+    def job(self, kind, key, payload):
+        now = datetime.utcnow()
+        return {"_id": key, "kind": kind, "payload": payload, "status": "pending", "attempts": 0,
+                "next_attempt_at": now, "created_at": now}
+
+    async def enqueue(self, kind, key, payload):
+        """Add one job; returns False if a job with this key already exists."""
+        try:
+            await self.collection.insert_one(self.job(kind, key, payload))
+        except DuplicateKeyError:
+            return False
+        self.notify()
+        return True
+
+    async def enqueue_many(self, jobs):
+        """Add (kind, key, payload) jobs in one round trip, skipping keys already queued."""
+        documents = [self.job(kind, key, payload) for kind, key, payload in jobs]
+        if not documents:
+            return 0
+        try:
+            result = await self.collection.insert_many(documents, ordered=False)
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            inserted = e.details.get("nInserted", 0)
+        self.notify()
+        return inserted
+
+    async def collect_many(self, entries):
+        """Add items to pending collecting jobs (e.g. digests), creating each job on first use.
+
+        ``entries`` are (kind, key, due_at, payload, item) tuples: a new job
+        gets ``payload`` and becomes due at ``due_at``; ``item`` is added to
+        the job's ``payload.items`` set, so adding it twice does nothing. All
+        entries are written in one bulk round trip. Returns the entries whose
+        job was already claimed; the caller must deliver those another way.
+        """
+        if not entries:
+            return []
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({"_id": key, "status": "pending"}, {
+                "$setOnInsert": {"kind": kind, "attempts": 0, "next_attempt_at": due_at, "created_at": now,
+                                 **{f"payload.{field}": value for field, value in payload.items()}},
+                "$addToSet": {"payload.items": item},
+            }, upsert=True)
+            for kind, key, due_at, payload, item in entries
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            # The upsert collided with a job that is no longer pending
+            return [entries[error["index"]] for error in errors]
+        return []
+
+    def notify(self):
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def claim(self):
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {"status": {"$in": ["pending", "running"]}, "next_attempt_at": {"$lte": now}},
+            {"$set": {"status": "running", "next_attempt_at": now + self.lease}, "$inc": {"attempts": 1}},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def finish(self, job, update):
+        # Matching the attempt count keeps a worker whose lease ran out from overwriting a newer attempt
+        await self.collection.update_one({"_id": job["_id"], "attempts": job["attempts"]}, {"$set": update})
+
+    async def process(self, job):
+        handler = self.handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise PermanentError(f"No handler for job kind {job['kind']!r}")
+            await handler(job["payload"], job["_id"])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            now = datetime.utcnow()
+            if isinstance(e, PermanentError) or job["attempts"] >= self.max_attempts:
+                self.dead += 1
+                print(f"Alert job {job['_id']} dead-lettered after {job['attempts']} attempt(s): {error}")
+                await self.finish(job, {"status": "dead", "last_error": error, "failed_at": now})
+            else:
+                self.retried += 1
+                retry_at = now + timedelta(seconds=retry_delay(job["attempts"]))
+                await self.finish(job, {"status": "pending", "last_error": error, "next_attempt_at": retry_at})
+            return
+        self.processed += 1
+        await self.finish(job, {"status": "done", "completed_at": datetime.utcnow()})
+
+    async def work(self):
+        failing = False
+        while not self.stopping:
+            # Cleared before claiming, so a job enqueued after an empty claim still wakes us
+            self.wakeup.clear()
+            try:
+                job = await self.claim()
+                failing = False
+            except Exception as e:
+                if not failing:
+                    print(f"Alert outbox unavailable: {str(e)}")
+                failing = True
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self.process(job)
+            except Exception as e:
+                # Could not record the outcome; the lease hands the job to a worker later
+                print(f"Alert job {job['_id']} outcome not saved: {str(e)}")
+
+    def start(self):
+        if self.tasks:
+            return
+        self.stopping = False
+        self.wakeup = asyncio.Event()
+        self.tasks = [asyncio.ensure_future(self.work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop claiming jobs and cancel the workers; interrupted jobs are retried after their lease."""
+        self.stopping = True
+        tasks, self.tasks = self.tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def status_counts(self):
+        counts = {"pending": 0, "running": 0, "done": 0, "dead": 0}
+        async for row in self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+    def metrics(self):
+        return {
+            "workers": len(self.tasks),
+            "processed": self.processed,
+            "retried": self.retried,
+            "dead_lettered": self.dead,
+        }
@@ -0,0 +1,339 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import aiosmtplib
+from bson import ObjectId
+from config.database import alert_outbox_collection, crimes_collection, subscribers_collection
+from config.email import render_alert, render_digest
+from services.alert_outbox import AlertOutbox, PermanentError
+from services.mailer import mailer
+from services.sms import SMS_BULK_SIZE, SMSRejected, sms_gateway
+
+# Largest subscriber radius honoured by the geo query, in kilometers
+MAX_ALERT_RADIUS_KM = float(os.getenv("MAX_ALERT_RADIUS_KM", 50))
+DEFAULT_ALERT_RADIUS_KM = 5.0
+# Reports submitted without a risk level are treated as this one
+DEFAULT_RISK_LEVEL = "Medium"
+# Delivery jobs are inserted this many at a time while the recipients are read
+FAN_OUT_CHUNK = 1000
+# Above 0, emails go out as one BCC message per this many recipients instead of one each
+ALERT_BCC_BATCH_SIZE = int(os.getenv("ALERT_BCC_BATCH_SIZE", 0))
+# Above 1, texts go out as one job (and provider request) per this many numbers
+ALERT_SMS_BATCH_SIZE = int(os.getenv("ALERT_SMS_BATCH_SIZE", SMS_BULK_SIZE))
+# A subscriber alerted less than this many minutes ago gets the next reports as one
+# digest at the end of the window instead of one message each; 0 sends every alert
+ALERT_DIGEST_MINUTES = float(os.getenv("ALERT_DIGEST_MINUTES", 15))
+# Rendered alerts kept per process, so the deliveries of a report share one rendering
+RENDERED_ALERTS_CACHE_SIZE = 64
+# Tries at queueing a report's alerts while the submit request waits
+ALERT_ENQUEUE_ATTEMPTS = 3
+# Reports still flagged alerts_pending this long after submission are queued by the sweep
+ALERT_SWEEP_SECONDS = float(os.getenv("ALERT_SWEEP_SECONDS", 60))
+
+RISK_PREFERENCE_FIELDS = {
+    "High": "notify_high_risk",
+    "Medium": "notify_medium_risk",
+    "Low": "notify_low_risk",
+}
+
+# Only what the senders need is read back for each recipient
+SUBSCRIBER_PROJECTION = {"email": 1, "phone": 1, "name": 1, "notify_email": 1, "notify_sms": 1,
+                         "last_notified": 1, "last_alert_report": 1}
+
+# Report fields the alert messages use; delivery jobs carry a copy
+ALERT_FIELDS = ["crime_type", "city", "location", "description", "date", "time", "risk_level"]
+
+
+def subscriber_filter(report):
+    """Active subscribers who want alerts of this report's risk level."""
+    preference = RISK_PREFERENCE_FIELDS[report.get("risk_level") or DEFAULT_RISK_LEVEL]
+    return {preference: {"$ne": False}, "is_active": {"$ne": False}}
+
+
+def find_recipients(report):
+    """Cursor over the subscribers whose alert radius covers the report.
+
+    $geoNear walks the 2dsphere index outward from the incident and stops at
+    MAX_ALERT_RADIUS_KM, so only the local audience is read; each subscriber's
+    own radius is then applied to the computed distance. Reports without
+    coordinates fall back to the subscribers of the same city.
+    """
+    if report.get("geo") is None:
+        query = dict(subscriber_filter(report), city=report["city"])
+        return subscribers_collection.find(query, SUBSCRIBER_PROJECTION)
+    return subscribers_collection.aggregate([
+        {"$geoNear": {
+            "near": report["geo"],
+            "distanceField": "distance",
+            "maxDistance": MAX_ALERT_RADIUS_KM * 1000,
+            "spherical": True,
+            "query": subscriber_filter(report),
+        }},
+        {"$match": {"$expr": {"$lte": [
+            "$distance", {"$multiply": [{"$ifNull": ["$radius", DEFAULT_ALERT_RADIUS_KM]}, 1000]}
+        ]}}},
+        {"$project": SUBSCRIBER_PROJECTION},
+    ])
+
+
+async def send_sms(phone, text):
+    try:
+        await sms_gateway.send(phone, text)
+    except SMSRejected as e:
+        raise PermanentError(str(e))
+
+
+async def send_sms_batch(phones, text):
+    try:
+        await sms_gateway.send_many(phones, text)
+    except SMSRejected as e:
+        raise PermanentError(str(e))
+
+
+def alert_sms_text(report):
+    return f"Crime Alert: {report.get('crime_type')} in {report.get('city')}. Stay safe!"
+
+
+def digest_sms_text(reports):
+    if len(reports) == 1:
+        return alert_sms_text(reports[0])
+    types = sorted({report.get('crime_type') for report in reports if report.get('crime_type')})
+    return f"Crime Alert: {len(reports)} incidents near you ({', '.join(types[:3])}). Stay safe!"
+
+
+def batch_job(kind, report_id, message, recipients):
+    # Keyed by its recipients, so a retried fan-out that forms the same batch does not queue it again
+    digest = hashlib.sha1("\n".join(recipients).encode()).hexdigest()[:16]
+    return (kind, f"{report_id}:{kind}:{digest}",
+            {"report_id": report_id, "to": recipients, "report": message})
+
+
+def subscriber_channels(subscriber):
+    """(channel, address) pairs the subscriber wants alerts on."""
+    channels = []
+    if subscriber.get("email") and subscriber.get("notify_email", True):
+        channels.append(("email", subscriber["email"]))
+    if subscriber.get("phone") and subscriber.get("notify_sms"):
+        channels.append(("sms", subscriber["phone"]))
+    return channels
+
+
+class FanOut:
+    """Delivery jobs for one report, written to Mongo in bulk every FAN_OUT_CHUNK recipients."""
+
+    def __init__(self, report_id, message, now):
+        self.report_id = report_id
+        self.message = message
+        self.now = now
+        self.jobs = []
+        self.bcc = []
+        self.sms = []
+        self.digests = []
+        self.notified = []
+
+    def immediate(self, subscriber_id, channel, to):
+        key = f"{self.report_id}:{subscriber_id}"
+        if channel == "sms" and ALERT_SMS_BATCH_SIZE > 1:
+            self.sms.append(to)
+            if len(self.sms) >= ALERT_SMS_BATCH_SIZE:
+                self.jobs.append(batch_job("sms_batch", self.report_id, self.message, self.sms))
+                self.sms = []
+        elif channel == "sms":
+            self.jobs.append(("sms", f"{key}:sms", {"to": to, "report": self.message}))
+        elif ALERT_BCC_BATCH_SIZE > 0:
+            self.bcc.append(to)
+            if len(self.bcc) >= ALERT_BCC_BATCH_SIZE:
+                self.jobs.append(batch_job("email_batch", self.report_id, self.message, self.bcc))
+                self.bcc = []
+        else:
+            self.jobs.append(("email", f"{key}:email", {"report_id": self.report_id, "to": to, "report": self.message}))
+
+    def add(self, subscriber):
+        channels = subscriber_channels(subscriber)
+        if not channels:
+            return
+        last = subscriber.get("last_notified")
+        window = timedelta(minutes=ALERT_DIGEST_MINUTES)
+        # A subscriber alerted by an earlier attempt of this fan-out is alerted again, not digested:
+        # the attempt forms the same jobs under the same keys, so nothing is queued twice
+        retried = subscriber.get("last_alert_report") == self.report_id
+        if window and last is not None and self.now - last < window and not retried:
+            # Alerted recently: the report waits in the digest that closes the window
+            due = last + window
+            for channel, to in channels:
+                key = f"{subscriber['_id']}:digest:{due:%Y%m%d%H%M%S}:{channel}"
+                payload = {"subscriber_id": subscriber["_id"], "to": to}
+                self.digests.append((f"{channel}_digest", key, due, payload, dict(self.message, report_id=self.report_id)))
+            return
+        self.notified.append(subscriber["_id"])
+        for channel, to in channels:
+            self.immediate(subscriber["_id"], channel, to)
+
+    def pending(self):
+        return len(self.jobs) + len(self.digests) + len(self.notified)
+
+    async def flush(self, last=False):
+        # Digests that were claimed while we were adding to them: alert these now instead
+        for kind, _, _, payload, _ in await alert_outbox.collect_many(self.digests):
+            self.immediate(payload["subscriber_id"], kind.split("_")[0], payload["to"])
+        if last and self.bcc:
+            self.jobs.append(batch_job("email_batch", self.report_id, self.message, self.bcc))
+            self.bcc = []
+        if last and self.sms:
+            self.jobs.append(batch_job("sms_batch", self.report_id, self.message, self.sms))
+            self.sms = []
+        await alert_outbox.enqueue_many(self.jobs)
+        if self.notified:
+            # One write starts the digest window of every subscriber alerted in this chunk and
+            # records the report, so a retried fan-out does not also add it to their digest
+            await subscribers_collection.update_many({"_id": {"$in": self.notified}},
+                                                     {"$max": {"last_notified": self.now},
+                                                      "$set": {"last_alert_report": self.report_id}})
+        self.jobs, self.digests, self.notified = [], [], []
+
+
+async def fan_out(payload, job_id):
+    """Turn a report job into one delivery job per recipient and channel.
+
+    Delivery keys are ``<report>:<subscriber>:<channel>``, so a fan-out that
+    is retried after a crash does not queue anyone twice. With
+    ALERT_BCC_BATCH_SIZE set, emails are grouped into BCC batch jobs instead,
+    and texts into batch jobs of ALERT_SMS_BATCH_SIZE numbers.
+    Subscribers inside their ALERT_DIGEST_MINUTES window get the report
+    added to their pending digest jobs rather than a message of its own.
+    """
+    report_id, report = payload["report_id"], payload["report"]
+    message = {field: report.get(field) for field in ALERT_FIELDS}
+    # Fixed when the report was queued, so every attempt finds the same digest windows and keys
+    now = payload.get("queued_at") or ObjectId(report_id).generation_time.replace(tzinfo=None)
+    batch = FanOut(report_id, message, now)
+    async for subscriber in find_recipients(report):
+        batch.add(subscriber)
+        if batch.pending() >= FAN_OUT_CHUNK:
+            await batch.flush()
+    await batch.flush(last=True)
+
+
+rendered_alerts = OrderedDict()
+
+
+def rendered_alert(report_id, report):
+    """The report's alert, rendered on its first delivery in this process."""
+    rendered = rendered_alerts.get(report_id)
+    if rendered is None:
+        rendered = rendered_alerts[report_id] = render_alert(report)
+        if len(rendered_alerts) > RENDERED_ALERTS_CACHE_SIZE:
+            rendered_alerts.popitem(last=False)
+    else:
+        rendered_alerts.move_to_end(report_id)
+    return rendered
+
+
+def message_id(job_id, rendered):
+    # Stable per job, so a retried delivery carries the same Message-ID
+    domain = (rendered.from_email or "localhost").rpartition("@")[2]
+    return f"{job_id.replace(':', '.')}@{domain}"
+
+
+async def deliver_email(payload, job_id):
+    rendered = rendered_alert(payload["report_id"], payload["report"])
+    try:
+        await mailer.send_raw(rendered.for_recipient(payload["to"], message_id(job_id, rendered)), [payload["to"]])
+    except aiosmtplib.SMTPRecipientsRefused as e:
+        # The address was rejected; resending will not change that
+        raise PermanentError(str(e))
+
+
+async def deliver_email_batch(payload, job_id):
+    rendered = rendered_alert(payload["report_id"], payload["report"])
+    # Raises only when every recipient is refused; partial refusals are accepted by the server
+    try:
+        await mailer.send_raw(rendered.for_bcc(message_id(job_id, rendered)), payload["to"])
+    except aiosmtplib.SMTPRecipientsRefused as e:
+        raise PermanentError(str(e))
+
+
+async def deliver_sms(payload, job_id):
+    await send_sms(payload["to"], alert_sms_text(payload["report"]))
+
+
+async def deliver_sms_batch(payload, job_id):
+    await send_sms_batch(payload["to"], alert_sms_text(payload["report"]))
+
+
+async def deliver_email_digest(payload, job_id):
+    rendered = render_digest(payload["items"])
+    try:
+        await mailer.send_raw(rendered.for_recipient(payload["to"], message_id(job_id, rendered)), [payload["to"]])
+    except aiosmtplib.SMTPRecipientsRefused as e:
+        raise PermanentError(str(e))
+    await digest_sent(payload)
+
+
+async def deliver_sms_digest(payload, job_id):
+    await send_sms(payload["to"], digest_sms_text(payload["items"]))
+    await digest_sent(payload)
+
+
+async def digest_sent(payload):
+    # The next window starts now; reports arriving in it form the next digest
+    await subscribers_collection.update_one({"_id": payload["subscriber_id"]},
+                                            {"$max": {"last_notified": datetime.utcnow()}})
+
+
+# Shared queue; main.py starts its workers at startup and stops them on exit
+alert_outbox = AlertOutbox(alert_outbox_collection, {
+    "report": fan_out,
+    "email": deliver_email,
+    "email_batch": deliver_email_batch,
+    "sms": deliver_sms,
+    "sms_batch": deliver_sms_batch,
+    "email_digest": deliver_email_digest,
+    "sms_digest": deliver_sms_digest,
+})
+
+
+async def queue_report_alerts(report_id, report):
+    """Queue the alerts for a stored report; the fan-out happens in the workers.
+
+    The job is keyed by the report id, so queueing a report again (a retry
+    below, or the sweep) never alerts twice. Once queued, the report's
+    ``alerts_pending`` flag is cleared; raises if every attempt fails.
+    """
+    payload = {"report_id": str(report_id), "queued_at": datetime.utcnow(),
+               "report": {k: v for k, v in report.items() if k not in ("_id", "alerts_pending")}}
+    for attempt in range(ALERT_ENQUEUE_ATTEMPTS):
+        try:
+            queued = await alert_outbox.enqueue("report", f"report:{report_id}", payload)
+            break
+        except Exception:
+            if attempt == ALERT_ENQUEUE_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(0.1 * 2 ** attempt)
+    await crimes_collection.update_one({"_id": report_id}, {"$unset": {"alerts_pending": ""}})
+    return queued
+
+
+async def queue_pending_report_alerts():
+    """Queue the alerts of reports whose submit request could not; returns how many."""
+    cutoff = ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=ALERT_SWEEP_SECONDS))
+    queued = 0
+    # Only reports older than one sweep interval, so a submit still retrying is left alone
+    async for report in crimes_collection.find({"alerts_pending": True, "_id": {"$lt": cutoff}}):
+        await queue_report_alerts(report["_id"], report)
+        queued += 1
+    return queued
+
+
+async def sweep_pending_reports():
+    """Run queue_pending_report_alerts every ALERT_SWEEP_SECONDS; main.py starts it."""
+    while True:
+        try:
+            queued = await queue_pending_report_alerts()
+            if queued:
+                print(f"Queued alerts for {queued} report(s) left pending at submission")
+        except Exception as e:
+            print(f"Pending report sweep failed: {str(e)}")
+        await asyncio.sleep(ALERT_SWEEP_SECONDS)
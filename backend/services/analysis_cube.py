@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from services.bucketing import HOUR_TIME_OF_DAY, TIME_OF_DAY_LABELS
+from services.counting import add_totals, joint_counts, value_codes
+from services.dataset import crime_dataset
+
+# Axis order shared by both cubes
+CITY, GENDER, AGE_GROUP, YEAR, MONTH = range(5)
+HOUR = TIME_OF_DAY = 5
+CRIME = 6
+
+MONTHS = list(range(1, 13))
+HOURS = list(range(24))
+
+
+class AnalysisCube:
+    """Pre-aggregated crime counts for every /api/analyze filter combination.
+
+    ``hour_counts`` is indexed by (city, gender, age group, year, month, hour)
+    and ``crime_counts`` by (city, gender, age group, year, month, time of day,
+    crime). Every filterable axis ends in an "all" slot and the hour axis also
+    carries one slot per time of day, so a query reads a handful of vectors and
+    its cost does not depend on the number of rows in the dataset.
+    """
+
+    def __init__(self, df):
+        self.cities = df['City'].cat.categories.tolist()
+        self.genders = df['Victim Gender'].cat.categories.tolist()
+        self.age_groups = df['AgeGroup'].cat.categories.tolist()
+        self.crimes = df['Crime Description'].cat.categories.tolist()
+        self.years = sorted(int(y) for y in df['Year'].dropna().unique())
+        self.times_of_day = list(TIME_OF_DAY_LABELS)
+        self.hour_time_of_day = HOUR_TIME_OF_DAY
+
+        base_codes = [
+            value_codes(df['City'], self.cities),
+            value_codes(df['Victim Gender'], self.genders),
+            value_codes(df['AgeGroup'], self.age_groups),
+            value_codes(df['Year'], self.years),
+            value_codes(df['Month'], MONTHS),
+        ]
+        base_shape = [len(labels) + 1 for labels in (self.cities, self.genders, self.age_groups, self.years, MONTHS)]
+
+        hours = add_totals(joint_counts(base_codes + [value_codes(df['Hour'], HOURS)], base_shape + [len(HOURS) + 1]), [HOUR])
+        # Hour axis layout: 24 hours, one slot per time of day, then "all"
+        by_time_of_day = [
+            hours[..., :len(HOURS)][..., self.hour_time_of_day == i].sum(axis=-1, keepdims=True)
+            for i in range(len(self.times_of_day))
+        ]
+        hours = np.concatenate([hours[..., :len(HOURS)]] + by_time_of_day + [hours[..., len(HOURS):]], axis=-1)
+        self.hour_counts = add_totals(hours, range(HOUR)).astype(np.uint32)
+
+        crimes = joint_counts(
+            base_codes + [value_codes(df['TimeOfDay'], self.times_of_day), value_codes(df['Crime Description'], self.crimes)],
+            base_shape + [len(self.times_of_day) + 1, len(self.crimes) + 1]
+        )
+        self.crime_counts = add_totals(crimes[..., :len(self.crimes)], range(TIME_OF_DAY + 1)).astype(np.uint32)
+
+    @staticmethod
+    def _position(labels, value):
+        """Index on one axis: -1 (the "all" slot) when unfiltered, None if no value matches."""
+        if value is None:
+            return -1
+        return labels.index(value) if value in labels else None
+
+    def query(self, city=None, gender=None, age_group=None, month=None, year=None, time_of_day=None):
+        """Return the total and per-dimension counts (as label-indexed Series,
+        empty entries dropped) for the rows matching every given filter."""
+        axes = [(self.cities, city), (self.genders, gender), (self.age_groups, age_group),
+                (self.years, year), (MONTHS, month)]
+        base = [self._position(labels, value) for labels, value in axes]
+        time_of_day_position = self._position(self.times_of_day, time_of_day)
+        if None in base or time_of_day_position is None:
+            empty = pd.Series([], dtype=np.int64)
+            return {"total": 0, "crime": empty, "hour": empty, "year": empty,
+                    "month": empty, "gender": empty, "age_group": empty}
+        hour_position = -1 if time_of_day is None else len(HOURS) + time_of_day_position
+
+        def marginal(counts, trailing, axis, labels):
+            index = base + trailing
+            index[axis] = slice(0, len(labels))
+            vector = counts[tuple(index)].astype(np.int64)
+            if axis < len(base) and base[axis] != -1:
+                # A filtered axis only keeps its selected value
+                vector = np.where(np.arange(len(labels)) == base[axis], vector, 0)
+            return pd.Series(vector, index=labels)[lambda s: s > 0]
+
+        hours = marginal(self.hour_counts, [None], HOUR, HOURS)
+        if time_of_day is not None:
+            hours = hours[self.hour_time_of_day[hours.index] == time_of_day_position]
+
+        return {
+            "total": int(self.hour_counts[tuple(base + [hour_position])]),
+            "crime": marginal(self.crime_counts, [time_of_day_position, None], CRIME, self.crimes),
+            "hour": hours,
+            "year": marginal(self.hour_counts, [hour_position], YEAR, self.years),
+            "month": marginal(self.hour_counts, [hour_position], MONTH, MONTHS),
+            "gender": marginal(self.hour_counts, [hour_position], GENDER, self.genders),
+            "age_group": marginal(self.hour_counts, [hour_position], AGE_GROUP, self.age_groups),
+        }
+
+
+_cube = None
+_cube_version = None
+
+
+def get_analysis_cube():
+    """Return the cube for the currently loaded dataset, building it on first use."""
+    global _cube, _cube_version
+    if crime_dataset.df.empty:
+        return None
+    if _cube is None or _cube_version != crime_dataset.version:
+        _cube = AnalysisCube(crime_dataset.df)
+        _cube_version = crime_dataset.version
+    return _cube
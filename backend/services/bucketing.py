@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+# Victim age groups; each edge is the inclusive upper bound of its group
+AGE_GROUP_LABELS = ['0-18', '19-30', '31-45', '46-60', '60+']
+AGE_GROUP_EDGES = np.array([18, 30, 45, 60])
+AGE_GROUP_OPTIONS = [
+    {"value": "0-18", "label": "0–18 (Child/Teen)"},
+    {"value": "19-30", "label": "19–30 (Young Adult)"},
+    {"value": "31-45", "label": "31–45 (Adult)"},
+    {"value": "46-60", "label": "46–60 (Middle-aged)"},
+    {"value": "60+", "label": "60+ (Senior)"}
+]
+
+# Night 0-5, Morning 6-11, Afternoon 12-17, Evening 18-23
+TIME_OF_DAY_LABELS = ['Night', 'Morning', 'Afternoon', 'Evening']
+HOUR_TIME_OF_DAY = np.repeat(np.arange(len(TIME_OF_DAY_LABELS), dtype=np.int8), 6)
+TIME_OF_DAY_OPTIONS = [
+    {"value": "Morning", "label": "Morning (6 AM - Noon)"},
+    {"value": "Afternoon", "label": "Afternoon (Noon - 6 PM)"},
+    {"value": "Evening", "label": "Evening (6 PM - Midnight)"},
+    {"value": "Night", "label": "Night (Midnight - 6 AM)"}
+]
+
+
+def age_group_codes(ages):
+    """Vectorized age -> index into AGE_GROUP_LABELS; -1 for missing or invalid ages."""
+    ages = pd.to_numeric(pd.Series(ages), errors='coerce').to_numpy(dtype=float)
+    codes = np.searchsorted(AGE_GROUP_EDGES, ages, side='left').astype(np.int8)
+    codes[np.isnan(ages) | (ages < 0)] = -1
+    return codes
+
+
+def time_of_day_codes(hours):
+    """Vectorized hour -> index into TIME_OF_DAY_LABELS; -1 for missing or invalid hours."""
+    hours = pd.to_numeric(pd.Series(hours), errors='coerce').to_numpy(dtype=float)
+    valid = (hours >= 0) & (hours < 24)
+    codes = np.full(len(hours), -1, dtype=np.int8)
+    codes[valid] = HOUR_TIME_OF_DAY[hours[valid].astype(np.int64)]
+    return codes
+
+
+def age_group(ages):
+    return pd.Categorical.from_codes(age_group_codes(ages), categories=AGE_GROUP_LABELS)
+
+
+def time_of_day(hours):
+    return pd.Categorical.from_codes(time_of_day_codes(hours), categories=TIME_OF_DAY_LABELS)
+
+
+def normalize_age_group(value):
+    """Accept an age group label or a plain age and return the label (None if invalid)."""
+    value = str(value).strip()
+    if value in AGE_GROUP_LABELS:
+        return value
+    code = age_group_codes([value])[0]
+    return AGE_GROUP_LABELS[code] if code >= 0 else None
+
+
+def normalize_time_of_day(value):
+    """Accept a time of day label (any case) or an hour and return the label (None if invalid)."""
+    value = str(value).strip()
+    if value.capitalize() in TIME_OF_DAY_LABELS:
+        return value.capitalize()
+    code = time_of_day_codes([value])[0]
+    return TIME_OF_DAY_LABELS[code] if code >= 0 else None
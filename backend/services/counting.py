@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+
+def value_codes(values, labels):
+    """Map ``values`` onto positions in ``labels``; missing values get len(labels)."""
+    codes = pd.Categorical(values, categories=labels).codes.astype(np.int64)
+    codes[codes < 0] = len(labels)
+    return codes
+
+
+def joint_counts(codes, shape):
+    """Rows per combination of ``codes`` (one array per axis), as an array of ``shape``."""
+    flat = np.ravel_multi_index(codes, shape)
+    return np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+
+
+def add_totals(counts, axes):
+    """Turn the trailing slot of each axis in ``axes`` into an "all values" total.
+
+    The slot first holds rows whose value was missing; after summing it holds
+    every row, so an unfiltered dimension is answered by indexing one cell.
+    """
+    for axis in axes:
+        index = [slice(None)] * counts.ndim
+        index[axis] = -1
+        counts[tuple(index)] = counts.sum(axis=axis)
+    return counts
@@ -0,0 +1,116 @@
+import os
+import numpy as np
+import pandas as pd
+
+from config.cities import city_coordinates
+from services import bucketing, dataset_cache
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Locations searched for the crime dataset, in order of preference
+CSV_CANDIDATES = [
+    os.getenv("CRIME_DATASET_PATH"),
+    os.path.join(backend_dir, 'crime_dataset_india.csv'),
+    os.path.join(backend_dir, '..', 'crime_dataset_india.csv'),
+]
+
+# Bump whenever preprocess() changes so stale binary caches are rebuilt
+SCHEMA_VERSION = 3
+USE_CACHE = os.getenv("CRIME_DATASET_CACHE", "1") != "0"
+
+REQUIRED_COLUMNS = ['City', 'Crime Description', 'Victim Gender', 'Crime Domain']
+
+# Low-cardinality text columns the routers filter or group by, stored as pandas categoricals;
+# other text columns are left as they are
+CATEGORICAL_COLUMNS = ['City', 'Crime Description', 'Victim Gender', 'Crime Domain', 'Weapon Used', 'Case Closed']
+
+# Parsed to datetime64; unparseable values become NaT
+DATE_COLUMNS = ['Date of Occurrence', 'Date Reported', 'Date Case Closed']
+
+
+def find_csv_path():
+    for path in CSV_CANDIDATES:
+        if path and os.path.exists(path):
+            return os.path.abspath(path)
+    return None
+
+
+def preprocess(df):
+    """Parse dates once and derive every column the routers group or filter by."""
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns in dataset: {missing}")
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    if 'Time of Occurrence' in df.columns:
+        df['Time of Occurrence'] = pd.to_datetime(df['Time of Occurrence'], errors='coerce')
+        df['Hour'] = df['Time of Occurrence'].dt.hour
+    else:
+        df['Hour'] = np.nan
+
+    df['Year'] = df['Date of Occurrence'].dt.year
+    df['Month'] = df['Date of Occurrence'].dt.month
+    df['DayOfWeek'] = df['Date of Occurrence'].dt.dayofweek
+
+    ages = df['Victim Age'] if 'Victim Age' in df.columns else pd.Series(np.nan, index=df.index)
+    df['AgeGroup'] = bucketing.age_group(ages)
+    df['TimeOfDay'] = bucketing.time_of_day(df['Hour'])
+
+    # Mapping the categories (not every row) keeps this at one lookup per city
+    df['Latitude'] = df['City'].map({city: c['lat'] for city, c in city_coordinates.items()}).astype(float)
+    df['Longitude'] = df['City'].map({city: c['lng'] for city, c in city_coordinates.items()}).astype(float)
+    return df
+
+
+class CrimeDataset:
+    """Crime records loaded once per process and shared by every router.
+
+    Routers must treat ``df`` as read-only: filter it with boolean masks and
+    work on the result rather than assigning columns in place.
+    """
+
+    def __init__(self):
+        self.df = pd.DataFrame()
+        self.path = None
+        self.version = None
+        # Called without arguments after every successful load (e.g. to drop caches)
+        self.listeners = []
+
+    def load(self, path=None, use_cache=USE_CACHE):
+        path = path or find_csv_path()
+        try:
+            if path is None:
+                raise FileNotFoundError("Could not find crime_dataset_india.csv")
+            manifest = dataset_cache.fresh_manifest(path, SCHEMA_VERSION) if use_cache else None
+            if manifest is not None:
+                df = dataset_cache.load_cache(manifest)
+                version = manifest["source"]["sha256"]
+            else:
+                df = preprocess(pd.read_csv(path))
+                version = dataset_cache.file_sha256(path)
+                if use_cache:
+                    try:
+                        dataset_cache.write_cache(df, path, SCHEMA_VERSION, sha256=version)
+                    except Exception as e:
+                        print(f"Could not write dataset cache: {str(e)}")
+            self.df = df
+            self.path = path
+            self.version = version
+        except Exception as e:
+            print(f"Error loading dataset: {str(e)}")
+            self.df = pd.DataFrame()
+            self.version = None
+            return self.df
+        for listener in self.listeners:
+            listener()
+        return self.df
+
+
+# Shared instance; main.py calls load() once at startup
+crime_dataset = CrimeDataset()
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CACHE_DIR = os.getenv("CRIME_DATASET_CACHE_DIR", os.path.join(backend_dir, 'cache', 'crime_dataset'))
+CACHE_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_stat(path):
+    stat = os.stat(path)
+    return {"mtime": stat.st_mtime, "size": stat.st_size}
+
+
+def read_manifest(cache_dir=CACHE_DIR):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format_version") != CACHE_FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def _write_manifest(manifest, cache_dir):
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(cache_dir, MANIFEST_NAME))
+
+
+def fresh_manifest(csv_path, schema_version, cache_dir=CACHE_DIR):
+    """Return the manifest if the cache was built from the current CSV, else None.
+
+    A matching mtime and size is trusted without reading the CSV; otherwise the
+    content hash decides, so touching the file does not force a rebuild.
+    ``schema_version`` must be bumped whenever the preprocessing changes.
+    """
+    manifest = read_manifest(cache_dir)
+    if manifest is None or manifest.get("schema_version") != schema_version:
+        return None
+    if not os.path.isdir(os.path.join(cache_dir, manifest["data_dir"])):
+        return None
+    stat = source_stat(csv_path)
+    source = manifest["source"]
+    if stat["mtime"] == source["mtime"] and stat["size"] == source["size"]:
+        return manifest
+    if stat["size"] != source["size"] or file_sha256(csv_path) != source["sha256"]:
+        return None
+    manifest["source"].update(stat)
+    _write_manifest(manifest, cache_dir)
+    return manifest
+
+
+def _column_entries(df):
+    entries = []
+    for i, name in enumerate(df.columns):
+        dtype = df[name].dtype
+        entry = {"name": name, "file": f"col{i}.npy"}
+        if isinstance(dtype, pd.CategoricalDtype):
+            entry.update(kind="category", categories=f"col{i}.categories.npy", ordered=bool(dtype.ordered))
+        elif dtype == object:
+            # Stored like a category, then turned back into plain text on load
+            entry.update(kind="text", categories=f"col{i}.categories.npy", ordered=False)
+        else:
+            entry["kind"] = "array"
+        entries.append(entry)
+    return entries
+
+
+def write_cache(df, csv_path, schema_version, cache_dir=CACHE_DIR, sha256=None):
+    """Store ``df`` column by column as uncompressed .npy files.
+
+    Categorical and text columns are written as integer codes plus a
+    categories array, so every file can be memory-mapped without unpickling
+    objects; text columns are rebuilt as object arrays when loaded.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    sha256 = sha256 or file_sha256(csv_path)
+    data_dir = f"{sha256[:16]}-v{schema_version}"
+    target = os.path.join(cache_dir, data_dir)
+    columns = _column_entries(df)
+
+    if not os.path.isdir(target):
+        tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix='.build-')
+        try:
+            for entry in columns:
+                series = df[entry["name"]]
+                if entry["kind"] in ("category", "text"):
+                    values = series.astype('category').cat
+                    categories = values.categories.to_numpy()
+                    if categories.dtype == object:
+                        categories = categories.astype(str)
+                    np.save(os.path.join(tmp_dir, entry["file"]), values.codes.to_numpy())
+                    np.save(os.path.join(tmp_dir, entry["categories"]), categories)
+                else:
+                    np.save(os.path.join(tmp_dir, entry["file"]), series.to_numpy())
+            os.rename(tmp_dir, target)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            # Another worker published the same data directory first
+            if not os.path.isdir(target):
+                raise
+
+    manifest = {
+        "format_version": CACHE_FORMAT_VERSION,
+        "schema_version": schema_version,
+        "source": dict(source_stat(csv_path), path=os.path.abspath(csv_path), sha256=sha256),
+        "rows": len(df),
+        "data_dir": data_dir,
+        "columns": columns,
+    }
+    _write_manifest(manifest, cache_dir)
+    # Workers still mapping an older directory keep their open inodes
+    for name in os.listdir(cache_dir):
+        stale = os.path.join(cache_dir, name)
+        if name != data_dir and os.path.isdir(stale) and not name.startswith('.'):
+            shutil.rmtree(stale, ignore_errors=True)
+    return manifest
+
+
+def load_cache(manifest, cache_dir=CACHE_DIR):
+    """Rebuild the DataFrame from memory-mapped column files."""
+    data_dir = os.path.join(cache_dir, manifest["data_dir"])
+    data = {}
+    for entry in manifest["columns"]:
+        values = np.load(os.path.join(data_dir, entry["file"]), mmap_mode='r')
+        if entry["kind"] in ("category", "text"):
+            categories = np.load(os.path.join(data_dir, entry["categories"]))
+            values = pd.Categorical.from_codes(values, categories=categories, ordered=entry["ordered"])
+            if entry["kind"] == "text":
+                values = np.asarray(values, dtype=object)
+        data[entry["name"]] = values
+    # copy=False keeps the array-backed columns pointing at the page cache
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import joblib
+import numpy as np
+
+FOREST_FORMAT_VERSION = 1
+ARRAYS = ['left', 'right', 'feature', 'threshold', 'values', 'roots']
+# meta.json keys derived from the arrays; anything else is caller metadata
+FOREST_KEYS = ['format_version', 'n_trees', 'n_features', 'classes', 'n_nodes', 'n_leaves', 'value_dtype', 'sha256']
+# Rows traversed together; bounds the (rows, trees, classes) temporary
+PREDICT_CHUNK_ELEMENTS = 1 << 22
+
+
+def forest_dir(model_path):
+    """The flattened export sits next to the pickle: crime_predictor.forest/."""
+    return os.path.splitext(model_path)[0] + '.forest'
+
+
+def load_model(model_path):
+    """(model, sha256) for a model path, preferring the flattened export.
+
+    The MappedForest is returned with its export hash when the forest
+    directory exists (incremental versions ship only that); otherwise the
+    pickle is loaded and the hash is None, meaning the pickle file's hash.
+    """
+    if os.path.isdir(forest_dir(model_path)):
+        model = MappedForest(forest_dir(model_path))
+        return model, model.sha256
+    return joblib.load(model_path), None
+
+
+def _float32_at_most(values):
+    """Largest float32 <= each value, so ``x <= t32`` equals ``x <= t`` for float32 x."""
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _flatten(model, node_offset=0, leaf_offset=0, class_columns=None, n_classes=None, value_dtype='float32'):
+    """Flatten the trees of ``model`` with node and leaf ids starting at the given offsets.
+
+    ``class_columns`` places the model's classes into value rows of width
+    ``n_classes``, for trees appended to a forest that knows more classes.
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    if any(tree.n_outputs != 1 for tree in trees):
+        raise ValueError("Only single-output forests can be exported")
+    n_nodes = node_offset + sum(tree.node_count for tree in trees)
+    index_dtype = np.int32 if n_nodes < 2 ** 31 else np.int64
+    feature_dtype = np.int8 if model.n_features_in_ < 128 else np.int32
+    n_classes = n_classes or len(model.classes_)
+    class_columns = np.arange(len(model.classes_)) if class_columns is None else np.asarray(class_columns)
+
+    left, right, feature, threshold, values, roots = [], [], [], [], [], []
+    for tree in trees:
+        is_leaf = tree.children_left == -1
+        leaf_ids = np.cumsum(is_leaf) - 1 + leaf_offset
+        left.append(np.where(is_leaf, -(leaf_ids + 1), tree.children_left + node_offset).astype(index_dtype))
+        right.append(np.where(is_leaf, 0, tree.children_right + node_offset).astype(index_dtype))
+        feature.append(np.where(is_leaf, 0, tree.feature).astype(feature_dtype))
+        threshold.append(_float32_at_most(np.where(is_leaf, 0, tree.threshold)))
+        counts = tree.value[is_leaf, 0, :]
+        leaf_values = np.zeros((len(counts), n_classes), dtype=value_dtype)
+        leaf_values[:, class_columns] = counts / counts.sum(axis=1, keepdims=True)
+        values.append(leaf_values)
+        roots.append(node_offset)
+        node_offset += tree.node_count
+        leaf_offset += int(is_leaf.sum())
+
+    return {
+        'left': np.concatenate(left),
+        'right': np.concatenate(right),
+        'feature': np.concatenate(feature),
+        'threshold': np.concatenate(threshold),
+        'values': np.concatenate(values),
+        'roots': np.array(roots, dtype=np.int64),
+    }
+
+
+def _write(arrays, meta, directory):
+    digest = hashlib.sha256()
+    for name in ARRAYS:
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    meta = dict(meta, format_version=FOREST_FORMAT_VERSION, n_trees=len(arrays['roots']),
+                n_nodes=len(arrays['left']), n_leaves=len(arrays['values']),
+                value_dtype=arrays['values'].dtype.name, sha256=digest.hexdigest())
+
+    # Build in a sibling directory and swap it in, so readers never see a partial export
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix='.forest-')
+    try:
+        for name in ARRAYS:
+            np.save(os.path.join(staging, name + '.npy'), arrays[name])
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.rename(staging, directory)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return meta
+
+
+def export_forest(model, directory, value_dtype='float32', extra_meta=None):
+    """Write a fitted RandomForestClassifier as flat node arrays that can be memory-mapped.
+
+    All trees share one set of arrays. ``left``/``right`` hold global child
+    indices; a leaf stores ``-(leaf + 1)`` in ``left`` and its class
+    probabilities (already normalized, in ``model.classes_`` order) in row
+    ``leaf`` of ``values``. Only leaves carry values, which is what keeps the
+    export much smaller than the pickle. ``extra_meta`` is stored in meta.json.
+    """
+    meta = dict(extra_meta or {}, n_features=int(model.n_features_in_), classes=np.asarray(model.classes_).tolist())
+    return _write(_flatten(model, value_dtype=value_dtype), meta, directory)
+
+
+def append_trees(base_dir, model, directory, extra_meta=None):
+    """Write the forest in ``base_dir`` plus every tree of ``model`` to ``directory``.
+
+    ``model`` must be fitted on targets encoded like the base forest's classes;
+    it may know only some of them, and its probabilities are placed in the
+    matching columns. Prediction averages over all trees, old and new.
+    """
+    base = MappedForest(base_dir)
+    if model.n_features_in_ != base.n_features_in_:
+        raise ValueError("Appended trees must use the same features as the base forest")
+    positions = {label: i for i, label in enumerate(base.meta["classes"])}
+    unknown = [label for label in np.asarray(model.classes_).tolist() if label not in positions]
+    if unknown:
+        raise ValueError(f"Classes not in the base forest: {unknown}")
+    class_columns = [positions[label] for label in np.asarray(model.classes_).tolist()]
+    added = _flatten(model, base.meta["n_nodes"], base.meta["n_leaves"], class_columns,
+                     len(base.classes_), base.meta["value_dtype"])
+    arrays = {name: np.concatenate([np.asarray(getattr(base, name)), added[name]]) for name in ARRAYS}
+    # Caller metadata of the base (e.g. the training watermark) carries over unless replaced
+    meta = {key: value for key, value in base.meta.items() if key in ("n_features", "classes") or key not in FOREST_KEYS}
+    meta.update(extra_meta or {})
+    return _write(arrays, meta, directory)
+
+
+class MappedForest:
+    """Read-only RandomForest predictor over memory-mapped node arrays.
+
+    Exposes ``classes_`` and ``predict_proba`` like the sklearn model it was
+    exported from. Every process mapping the same files shares their pages.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") != FOREST_FORMAT_VERSION:
+            raise ValueError(f"Unsupported forest format in {directory}")
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(directory, name + '.npy'), mmap_mode='r'))
+        self.classes_ = np.array(self.meta["classes"])
+        self.n_features_in_ = self.meta["n_features"]
+        self.n_trees = self.meta["n_trees"]
+        self.sha256 = self.meta["sha256"]
+
+    def apply(self, X):
+        """Leaf index reached in every tree, shape (rows, trees)."""
+        n_rows = len(X)
+        rows = np.repeat(np.arange(n_rows), self.n_trees)
+        nodes = np.tile(np.asarray(self.roots), n_rows)
+        leaves = np.empty(len(nodes), dtype=np.int64)
+        active = np.arange(len(nodes))
+        # One step down every unfinished path per iteration, so the loop runs tree-depth times
+        while active.size:
+            node = nodes[active]
+            left = self.left[node].astype(np.int64)
+            done = left < 0
+            leaves[active[done]] = -left[done] - 1
+            keep = ~done
+            active, node, left = active[keep], node[keep], left[keep]
+            go_left = X[rows[active], self.feature[node]] <= self.threshold[node]
+            nodes[active] = np.where(go_left, left, self.right[node])
+        return leaves.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        chunk = max(1, PREDICT_CHUNK_ELEMENTS // (self.n_trees * len(self.classes_)))
+        probabilities = np.empty((len(X), len(self.classes_)), dtype=np.float64)
+        for start in range(0, len(X), chunk):
+            leaves = self.apply(X[start:start + chunk])
+            probabilities[start:start + chunk] = self.values[leaves].sum(axis=1, dtype=np.float64) / self.n_trees
+        return probabilities
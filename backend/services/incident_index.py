@@ -0,0 +1,90 @@
+import numpy as np
+
+from services.dataset import crime_dataset
+
+# Columns of a map incident, in response order
+INCIDENT_COLUMNS = ['Latitude', 'Longitude', 'Crime Description', 'City', 'Date of Occurrence']
+
+
+def _labels(categories):
+    # Code -1 (missing) indexes the trailing None
+    return np.array(categories.tolist() + [None], dtype=object)
+
+
+class IncidentIndex:
+    """Map incidents (rows with coordinates) as flat arrays, grouped by year.
+
+    A query returns the dataset row positions that match, in row order, so a
+    response can be produced page by page from the arrays without copying
+    the matching rows out of the DataFrame first.
+    """
+
+    def __init__(self, df):
+        located = df['Latitude'].notna().to_numpy() & df['Longitude'].notna().to_numpy()
+        self.latitude = df['Latitude'].to_numpy(dtype=np.float64)
+        self.longitude = df['Longitude'].to_numpy(dtype=np.float64)
+        self.crime_codes = df['Crime Description'].cat.codes.to_numpy()
+        self.crime_labels = _labels(df['Crime Description'].cat.categories)
+        self.crimes = df['Crime Description'].cat.categories
+        self.city_codes = df['City'].cat.codes.to_numpy()
+        self.city_labels = _labels(df['City'].cat.categories)
+        self.dates = df['Date of Occurrence'].to_numpy(dtype='datetime64[ns]')
+
+        # Row positions sorted by year (stable, so row order within a year)
+        years = df['Year'].to_numpy(dtype=np.float64)
+        positions = np.flatnonzero(located & ~np.isnan(years))
+        order = np.argsort(years[positions], kind='stable')
+        self.positions = positions[order]
+        self.years = years[self.positions]
+
+    def query(self, year, crime_type=None, bbox=None, after=-1):
+        """Row positions of the year's incidents, optionally filtered, greater than ``after``.
+
+        ``crime_type`` is a case-insensitive pattern searched in the crime description;
+        ``bbox`` is (min_lat, max_lat, min_lng, max_lng).
+        """
+        start = np.searchsorted(self.years, year, side='left')
+        end = np.searchsorted(self.years, year, side='right')
+        positions = self.positions[start:end]
+        positions = positions[positions > after]
+        if crime_type:
+            # Matched against the few category labels, then selected by code
+            matching = np.flatnonzero(self.crimes.str.contains(crime_type, case=False))
+            positions = positions[np.isin(self.crime_codes[positions], matching)]
+        if bbox is not None:
+            min_lat, max_lat, min_lng, max_lng = bbox
+            lat, lng = self.latitude[positions], self.longitude[positions]
+            positions = positions[(lat >= min_lat) & (lat <= max_lat) & (lng >= min_lng) & (lng <= max_lng)]
+        return positions
+
+    def columns(self, positions):
+        """The incidents at ``positions`` as parallel lists, one per INCIDENT_COLUMNS entry."""
+        dates = self.dates[positions]
+        date_strings = np.datetime_as_string(dates, unit='s').astype(object)
+        date_strings[np.isnat(dates)] = None
+        return {
+            'Latitude': self.latitude[positions].tolist(),
+            'Longitude': self.longitude[positions].tolist(),
+            'Crime Description': self.crime_labels[self.crime_codes[positions]].tolist(),
+            'City': self.city_labels[self.city_codes[positions]].tolist(),
+            'Date of Occurrence': date_strings.tolist(),
+        }
+
+    def records(self, positions):
+        columns = self.columns(positions)
+        return [dict(zip(INCIDENT_COLUMNS, row)) for row in zip(*(columns[c] for c in INCIDENT_COLUMNS))]
+
+
+_index = None
+_index_version = None
+
+
+def get_incident_index():
+    """Return the index for the currently loaded dataset, building it on first use."""
+    global _index, _index_version
+    if crime_dataset.df.empty:
+        return None
+    if _index is None or _index_version != crime_dataset.version:
+        _index = IncidentIndex(crime_dataset.df)
+        _index_version = crime_dataset.version
+    return _index
@@ -0,0 +1,167 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from services import model_store
+from services.prediction import prediction_service
+
+# "thread" shares one loaded model; "process" loads a copy per worker but
+# sidesteps the GIL for the parts of inference that hold it
+EXECUTOR_KIND = os.getenv("PREDICTION_EXECUTOR", "thread")
+WORKERS = int(os.getenv("PREDICTION_WORKERS", 2))
+# Predictions allowed to run at once; the rest wait on the semaphore
+MAX_CONCURRENCY = int(os.getenv("PREDICTION_MAX_CONCURRENCY", WORKERS))
+# How often the model directory's CURRENT pointer is checked; 0 disables the watcher
+MODEL_POLL_SECONDS = float(os.getenv("PREDICTION_MODEL_POLL_SECONDS", 0))
+
+
+def _load_worker_model(version=None):
+    """Make sure this worker has a model loaded; True if it does."""
+    if prediction_service.model is not None:
+        return True
+    if not prediction_service.load_model(version):
+        print("Prediction worker started without a model")
+        return False
+    return True
+
+
+class InferencePool:
+    """Runs predictions outside the event loop with bounded concurrency."""
+
+    def __init__(self, kind=EXECUTOR_KIND, workers=WORKERS, max_concurrency=MAX_CONCURRENCY):
+        self.kind = kind
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.executor = None
+        self.semaphore = None
+        self.version = None
+        self.reloads = 0
+        self.reload_lock = None
+        self.watcher = None
+        self.failed_version = None
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+
+    def _start_process_pool(self, version):
+        executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_load_worker_model, initargs=(version,))
+        # Start every worker now so the model loads before the first request
+        futures = [executor.submit(_load_worker_model, version) for _ in range(self.workers)]
+        return executor, all(future.result() for future in futures)
+
+    def start(self):
+        if self.executor is not None:
+            return
+        version = model_store.current_version()
+        if self.kind == "process":
+            self.executor, _ = self._start_process_pool(version)
+        else:
+            _load_worker_model(version)
+            version = prediction_service.version
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prediction")
+        self.version = version
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.reload_lock = asyncio.Lock()
+        print(f"Prediction pool started: {self.workers} {self.kind} worker(s), concurrency {self.max_concurrency}")
+
+    def shutdown(self):
+        if self.watcher is not None:
+            self.watcher.cancel()
+            self.watcher = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def reload(self, version=None, make_current=False):
+        """Load a model version (CURRENT by default) in the background and switch to it.
+
+        Requests keep being served by the old model until the new one is loaded
+        and warmed up; if loading fails the old model stays and RuntimeError is raised.
+        With ``make_current`` the version also becomes CURRENT once it is live.
+        """
+        if self.executor is None:
+            self.start()
+        async with self.reload_lock:
+            version = version or model_store.current_version()
+            if make_current and version not in model_store.list_versions():
+                raise ValueError(f"Unknown model version: {version}")
+            loop = asyncio.get_running_loop()
+            if self.kind == "process":
+                executor, loaded = await loop.run_in_executor(None, self._start_process_pool, version)
+                if not loaded:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise RuntimeError(f"Could not load model version {version}")
+                old, self.executor = self.executor, executor
+                # Predictions already handed to the old workers finish there
+                old.shutdown(wait=False)
+            elif not await loop.run_in_executor(None, prediction_service.load_model, version):
+                raise RuntimeError(prediction_service.load_error)
+            if make_current:
+                model_store.set_current(version)
+            self.version = version
+            self.reloads += 1
+            print(f"Prediction model switched to version {version}")
+            return version
+
+    def start_watcher(self, interval=MODEL_POLL_SECONDS):
+        if interval > 0 and self.watcher is None:
+            self.watcher = asyncio.ensure_future(self._watch(interval))
+
+    async def _watch(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            if self.reload_lock.locked():
+                continue
+            version = model_store.current_version()
+            # A version that failed to load is not retried until CURRENT changes again
+            if version is not None and version not in (self.version, self.failed_version):
+                try:
+                    await self.reload(version)
+                    self.failed_version = None
+                except Exception as e:
+                    self.failed_version = version
+                    print(f"Model reload failed: {str(e)}")
+
+    async def run(self, fn, *args):
+        if self.executor is None:
+            self.start()
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        waiting = True
+        try:
+            async with self.semaphore:
+                self.queued -= 1
+                waiting = False
+                self.running += 1
+                try:
+                    result = await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+                except Exception:
+                    self.failed += 1
+                    raise
+                finally:
+                    self.running -= 1
+                self.completed += 1
+                return result
+        finally:
+            if waiting:
+                self.queued -= 1
+
+    def metrics(self):
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "model_version": self.version,
+            "reloads": self.reloads,
+            "queue_depth": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+# Shared pool; main.py starts it at startup and shuts it down on exit
+inference_pool = InferencePool()
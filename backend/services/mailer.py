@@ -0,0 +1,180 @@
+import asyncio
+import os
+import time
+import aiosmtplib
+from email import policy
+from email.header import Header
+from email.utils import formatdate
+
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 4))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 30))
+# Reconnect after this many messages or this long idle; servers drop old sessions
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", 500))
+SMTP_MAX_IDLE_SECONDS = float(os.getenv("SMTP_MAX_IDLE_SECONDS", 60))
+
+# Replies refusing the message itself; the client has reset the session and it can be reused
+REJECTIONS = (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPRecipientRefused,
+              aiosmtplib.SMTPSenderRefused, aiosmtplib.SMTPDataError)
+
+
+class RenderedEmail:
+    """A message whose MIME body is serialized once, for any number of recipients.
+
+    ``body`` is the message minus its addressing headers, already encoded for
+    SMTP. ``for_recipient``/``for_bcc`` only prepend From/To/Subject/Date/
+    Message-ID, so per-recipient work is a few short byte strings.
+    """
+
+    def __init__(self, subject, body_part, from_email):
+        self.from_email = from_email
+        self.subject = Header(subject, 'utf-8').encode()
+        self.body = body_part.as_bytes(policy=policy.SMTP)
+
+    def headers(self, to, message_id=None):
+        # Addresses come from stored subscribers; line breaks would inject headers
+        to = to.replace('\r', '').replace('\n', '')
+        lines = [f"From: {self.from_email}", f"To: {to}", f"Subject: {self.subject}",
+                 f"Date: {formatdate()}"]
+        if message_id:
+            lines.append(f"Message-ID: <{message_id}>")
+        return ("\r\n".join(lines) + "\r\n").encode()
+
+    def for_recipient(self, to, message_id=None):
+        return self.headers(to, message_id) + self.body
+
+    def for_bcc(self, message_id=None):
+        # Recipients are only in the envelope; none of them see the others
+        return self.headers("undisclosed-recipients:;", message_id) + self.body
+
+
+class Connection:
+    def __init__(self, client):
+        self.client = client
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPMailer:
+    """Async SMTP transport over a bounded pool of persistent, logged-in connections.
+
+    At most ``pool_size`` messages are in flight; further sends wait for a
+    free connection instead of opening new ones. Each connection is opened,
+    upgraded with STARTTLS and authenticated once, then reused for message
+    after message. A connection the server has dropped is replaced and the
+    message retried once; one that timed out or broke protocol is closed,
+    never returned to the pool.
+
+    Settings come from the same SMTP_* variables config/email.py used;
+    SMTP_STARTTLS=0 and an empty SMTP_USER allow a plain local stub server.
+    """
+
+    def __init__(self, pool_size=SMTP_POOL_SIZE, timeout=SMTP_TIMEOUT,
+                 max_messages=SMTP_MAX_MESSAGES_PER_CONNECTION, max_idle=SMTP_MAX_IDLE_SECONDS):
+        self.hostname = os.getenv("SMTP_SERVER")
+        self.port = int(os.getenv("SMTP_PORT", 587))
+        self.username = os.getenv("SMTP_USER") or None
+        self.password = os.getenv("SMTP_PASSWORD") or None
+        self.from_email = os.getenv("FROM_EMAIL", self.username)
+        self.use_tls = self.port == 465
+        self.start_tls = not self.use_tls and os.getenv("SMTP_STARTTLS", "1") != "0"
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self.max_idle = max_idle
+        self.idle = []
+        self.slots = None
+        self.in_flight = 0
+        self.sent = 0
+        self.failed = 0
+        self.connections_opened = 0
+
+    async def connect(self):
+        client = aiosmtplib.SMTP(hostname=self.hostname, port=self.port, timeout=self.timeout,
+                                 use_tls=self.use_tls, start_tls=self.start_tls,
+                                 username=self.username, password=self.password)
+        await client.connect()
+        self.connections_opened += 1
+        return Connection(client)
+
+    async def discard(self, connection):
+        try:
+            await connection.client.quit()
+        except Exception:
+            connection.client.close()
+
+    async def acquire(self):
+        while self.idle:
+            connection = self.idle.pop()
+            stale = time.monotonic() - connection.last_used > self.max_idle
+            if connection.client.is_connected and not stale:
+                return connection
+            await self.discard(connection)
+        return await self.connect()
+
+    def release(self, connection):
+        connection.last_used = time.monotonic()
+        if connection.sent >= self.max_messages:
+            asyncio.ensure_future(self.discard(connection))
+        else:
+            self.idle.append(connection)
+
+    async def send(self, message):
+        """Send one email.message.Message; raises aiosmtplib errors on failure."""
+        if message.get("From") is None:
+            message["From"] = self.from_email
+        await self.transmit(lambda client: client.send_message(message))
+
+    async def send_raw(self, data, recipients, sender=None):
+        """Send an already serialized message (e.g. from RenderedEmail) to the envelope ``recipients``."""
+        await self.transmit(lambda client: client.sendmail(sender or self.from_email, recipients, data))
+
+    async def transmit(self, send):
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.pool_size)
+        async with self.slots:
+            self.in_flight += 1
+            try:
+                for attempt in range(2):
+                    connection = await self.acquire()
+                    try:
+                        await send(connection.client)
+                    except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+                        # Dropped while idle in the pool; retry once on a fresh connection
+                        connection.client.close()
+                        if attempt:
+                            raise
+                        continue
+                    except REJECTIONS:
+                        self.release(connection)
+                        raise
+                    except Exception:
+                        # A timeout or protocol error leaves the session in an unknown state
+                        connection.client.close()
+                        raise
+                    connection.sent += 1
+                    self.release(connection)
+                    self.sent += 1
+                    return
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.in_flight -= 1
+
+    async def close(self):
+        idle, self.idle = self.idle, []
+        await asyncio.gather(*(self.discard(connection) for connection in idle), return_exceptions=True)
+
+    def metrics(self):
+        return {
+            "pool_size": self.pool_size,
+            "open_connections": len(self.idle) + self.in_flight,
+            "in_flight": self.in_flight,
+            "sent": self.sent,
+            "failed": self.failed,
+            "connections_opened": self.connections_opened,
+        }
+
+
+# Shared transport for alert emails; main.py closes it on shutdown
+mailer = SMTPMailer()
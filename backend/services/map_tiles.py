@@ -0,0 +1,119 @@
+import math
+import os
+import numpy as np
+
+from services.counting import add_totals, joint_counts, value_codes
+from services.dataset import crime_dataset
+from services.response_cache import ResponseCache
+from services.summary_stats import distribution
+from config.cities import city_coordinates
+
+# Cells per tile side in a /tiles response
+TILE_GRID_SIZE = 8
+MAX_ZOOM = 22
+# Tile responses kept; separate from the dashboard cache so panning cannot evict its entries
+MAP_TILE_CACHE_SIZE = int(os.getenv("MAP_TILE_CACHE_SIZE", 1024))
+
+
+def world_position(lat, lng):
+    """Web Mercator position of a coordinate, as (x, y) fractions of the world in [0, 1)."""
+    lat = np.clip(lat, -85.05112878, 85.05112878)
+    x = (np.asarray(lng) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(np.radians(lat)) + 1.0 / np.cos(np.radians(lat))) / math.pi) / 2.0
+    return x, y
+
+
+class TileGrid:
+    """Incident counts by year x city x crime type, placed on the Web Mercator grid.
+
+    Every incident sits on its city's centroid, so a map point is a city and
+    a tile is answered from the cities inside it: any zoom level, year and
+    crime filter costs O(cities x crime types), however many incidents there are.
+    """
+
+    def __init__(self, df):
+        self.cities = [city for city in df['City'].cat.categories if city in city_coordinates]
+        self.crime_categories = df['Crime Description'].cat.categories
+        self.crimes = self.crime_categories.tolist()
+        self.years = sorted(int(year) for year in df['Year'].dropna().unique())
+        codes = [value_codes(df['Year'], self.years), value_codes(df['City'], self.cities), value_codes(df['Crime Description'], self.crimes)]
+        # The trailing year slot holds every year; the trailing crime slot rows without a crime type
+        self.counts = add_totals(joint_counts(codes, (len(self.years) + 1, len(self.cities) + 1, len(self.crimes) + 1)), [0])
+        self.latitude = np.array([city_coordinates[city]['lat'] for city in self.cities])
+        self.longitude = np.array([city_coordinates[city]['lng'] for city in self.cities])
+        self.world_x, self.world_y = world_position(self.latitude, self.longitude)
+
+    def city_counts(self, year=None, crime_type=None):
+        """(counts per city x crime type, total per city) for the year and crime filter."""
+        if year is None:
+            table = self.counts[-1, :-1]
+        elif year in self.years:
+            table = self.counts[self.years.index(year), :-1]
+        else:
+            table = np.zeros_like(self.counts[-1, :-1])
+        if crime_type:
+            # Case-insensitive pattern, like the /crime_incidents filter
+            keep = np.zeros(len(self.crimes) + 1, dtype=bool)
+            keep[:-1] = self.crime_categories.str.contains(crime_type, case=False)
+            table = table * keep
+        return table, table.sum(axis=1)
+
+    def tile(self, z, x, y, year=None, crime_type=None, grid=TILE_GRID_SIZE):
+        """Cells of tile z/x/y (split ``grid`` x ``grid``) that hold incidents.
+
+        Each cell has its count, the count-weighted centre of its cities and
+        its crime types, largest first.
+        """
+        table, totals = self.city_counts(year, crime_type)
+        scale = 2 ** z
+        tile_x = self.world_x * scale - x
+        tile_y = self.world_y * scale - y
+        inside = np.flatnonzero((tile_x >= 0) & (tile_x < 1) & (tile_y >= 0) & (tile_y < 1) & (totals > 0))
+
+        columns = np.minimum((tile_x[inside] * grid).astype(np.int64), grid - 1)
+        rows = np.minimum((tile_y[inside] * grid).astype(np.int64), grid - 1)
+        cells, members = np.unique(rows * grid + columns, return_inverse=True)
+        weights = totals[inside]
+        cell_totals = np.bincount(members, weights=weights, minlength=len(cells))
+        cell_lat = np.bincount(members, weights=weights * self.latitude[inside], minlength=len(cells)) / cell_totals
+        cell_lng = np.bincount(members, weights=weights * self.longitude[inside], minlength=len(cells)) / cell_totals
+        cell_crimes = np.zeros((len(cells), table.shape[1]), dtype=np.int64)
+        np.add.at(cell_crimes, members, table[inside])
+        cell_cities = np.bincount(members, minlength=len(cells))
+
+        return {
+            "z": z, "x": x, "y": y, "grid": grid,
+            "count": int(cell_totals.sum()),
+            "cells": [
+                {
+                    "row": int(cell // grid),
+                    "column": int(cell % grid),
+                    "lat": float(cell_lat[i]),
+                    "lng": float(cell_lng[i]),
+                    "count": int(cell_totals[i]),
+                    "cities": int(cell_cities[i]),
+                    "crime_types": distribution(self.crimes, cell_crimes[i, :-1]),
+                }
+                for i, cell in enumerate(cells)
+            ],
+        }
+
+
+_grid = None
+_grid_version = None
+
+
+def get_tile_grid():
+    """Return the grid for the currently loaded dataset, building it on first use."""
+    global _grid, _grid_version
+    if crime_dataset.df.empty:
+        return None
+    if _grid is None or _grid_version != crime_dataset.version:
+        _grid = TileGrid(crime_dataset.df)
+        _grid_version = crime_dataset.version
+    return _grid
+
+
+# Shared cache for /api/map_data/tiles; emptied when a new dataset is loaded
+tile_cache = ResponseCache(max_entries=MAP_TILE_CACHE_SIZE)
+crime_dataset.listeners.append(tile_cache.invalidate)
@@ -0,0 +1,87 @@
+import asyncio
+import os
+
+from services.inference_pool import inference_pool
+from services.prediction import predict_crime_types
+
+# How long the first request of a batch may wait for others to join
+MAX_LATENCY_MS = float(os.getenv("PREDICTION_BATCH_LATENCY_MS", 2))
+MAX_BATCH_SIZE = int(os.getenv("PREDICTION_BATCH_SIZE", 64))
+
+
+class MicroBatcher:
+    """Groups concurrent single predictions into one predict_proba call.
+
+    A batch is sent to the inference pool when it reaches ``max_batch_size``
+    or ``max_latency_ms`` after its first request arrived, whichever comes
+    first; every caller then gets its own row of the result.
+    """
+
+    def __init__(self, max_latency_ms=MAX_LATENCY_MS, max_batch_size=MAX_BATCH_SIZE, top_k=3):
+        self.max_latency = max_latency_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.top_k = top_k
+        self.pending = []
+        self.timer = None
+        self.tasks = set()
+        # Batch count per size bucket: "1", "2", "<=4", "<=8", ...
+        self.histogram = {}
+        self.batches = 0
+        self.items = 0
+
+    async def predict(self, item):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((item, future))
+        if len(self.pending) >= self.max_batch_size or self.max_latency <= 0:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.max_latency, self.flush)
+        return await future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        self.record(len(batch))
+        task = asyncio.ensure_future(self.run(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run(self, batch):
+        try:
+            results = await inference_pool.run(predict_crime_types, [item for item, _ in batch], self.top_k)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                # A dict means the whole call failed (e.g. no model); every caller gets it
+                future.set_result(results if isinstance(results, dict) else results[i])
+
+    def record(self, size):
+        bucket = 1
+        while bucket < size:
+            bucket *= 2
+        key = str(bucket) if bucket <= 2 else f"<={bucket}"
+        self.histogram[key] = self.histogram.get(key, 0) + 1
+        self.batches += 1
+        self.items += size
+
+    def metrics(self):
+        return {
+            "max_latency_ms": self.max_latency * 1000,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0,
+            "batch_size_histogram": dict(sorted(self.histogram.items(), key=lambda kv: int(kv[0].lstrip('<=')))),
+        }
+
+
+# Shared batcher used by POST /api/prediction/
+prediction_batcher = MicroBatcher()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import time
+
+from services.forest import forest_dir
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Layout: MODEL_DIR/versions/<version>/{crime_predictor,label_encoders}.pkl and
+# MODEL_DIR/CURRENT naming the live version. Without CURRENT the flat
+# MODEL_DIR/crime_predictor.pkl written by scripts/train_model.py is used.
+MODEL_DIR = os.getenv("PREDICTION_MODEL_DIR", os.path.join(backend_dir, 'models'))
+MODEL_FILE = 'crime_predictor.pkl'
+ENCODERS_FILE = 'label_encoders.pkl'
+CURRENT_FILE = 'CURRENT'
+
+
+def versions_dir(model_dir=MODEL_DIR):
+    return os.path.join(model_dir, 'versions')
+
+
+def current_version(model_dir=MODEL_DIR):
+    """The version named by CURRENT, or None for the flat layout."""
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def model_files(version=None, model_dir=MODEL_DIR):
+    """Return (version, model path, encoders path); ``version`` defaults to CURRENT."""
+    version = version or current_version(model_dir)
+    directory = os.path.join(versions_dir(model_dir), version) if version else model_dir
+    return version, os.path.join(directory, MODEL_FILE), os.path.join(directory, ENCODERS_FILE)
+
+
+def list_versions(model_dir=MODEL_DIR):
+    try:
+        return sorted(name for name in os.listdir(versions_dir(model_dir)) if not name.startswith('.'))
+    except OSError:
+        return []
+
+
+def set_current(version, model_dir=MODEL_DIR):
+    """Point CURRENT at ``version``; the rename makes the switch atomic."""
+    if not os.path.isdir(os.path.join(versions_dir(model_dir), version)):
+        raise ValueError(f"Unknown model version: {version}")
+    fd, tmp_path = tempfile.mkstemp(dir=model_dir)
+    with os.fdopen(fd, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp_path, os.path.join(model_dir, CURRENT_FILE))
+
+
+def publish(model_path, encoders_path, version=None, model_dir=MODEL_DIR, make_current=True):
+    """Copy a trained model into versions/<version>/ and optionally make it live."""
+    version = version or time.strftime('%Y%m%d-%H%M%S')
+    target = os.path.join(versions_dir(model_dir), version)
+    if os.path.exists(target):
+        raise ValueError(f"Model version already exists: {version}")
+    # Copy into a temporary directory first so a watcher never sees half a version
+    os.makedirs(versions_dir(model_dir), exist_ok=True)
+    staging = tempfile.mkdtemp(dir=versions_dir(model_dir), prefix='.staging-')
+    try:
+        # A version needs the pickle, the flattened forest export, or both
+        has_forest = os.path.isdir(forest_dir(model_path))
+        if has_forest:
+            shutil.copytree(forest_dir(model_path), forest_dir(os.path.join(staging, MODEL_FILE)))
+        if os.path.exists(model_path) or not has_forest:
+            shutil.copy2(model_path, os.path.join(staging, MODEL_FILE))
+        shutil.copy2(encoders_path, os.path.join(staging, ENCODERS_FILE))
+        os.rename(staging, target)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if make_current:
+        set_current(version, model_dir)
+    return version
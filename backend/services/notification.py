@@ -1,89 +1,93 @@
-import smtplib
+import asyncio
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 from datetime import datetime
 from dotenv import load_dotenv
-import requests
 from sqlalchemy.orm import Session
 from models.subscriber import Subscriber
 from models.crime import Crime
+import numpy as np
+from services.mailer import RenderedEmail, mailer
+from services.sms import sms_gateway
+from services.spatial_index import RadiusGridIndex
 
 load_dotenv()
 
 class NotificationService:
     def __init__(self):
         self.email_sender = os.getenv("EMAIL_SENDER")
-        self.email_password = os.getenv("EMAIL_PASSWORD")
-        self.sms_api_key = os.getenv("SMS_API_KEY")
-        self.sms_sender = os.getenv("SMS_SENDER")
+        self.subscribers = []
+        self.subscriber_index = None
+        self.risk_preferences = {}
     
-    async def notify_subscribers(self, crime: Crime, subscribers: list[Subscriber], db: Session):
-        """Notify subscribers about a new crime incident"""
+    def set_subscribers(self, subscribers: list[Subscriber]):
+        """Index the active subscribers by location once, for every later incident"""
+        self.subscribers = [s for s in subscribers if s.is_active]
+        self.subscriber_index = RadiusGridIndex(
+            [np.nan if s.latitude is None else s.latitude for s in self.subscribers],
+            [np.nan if s.longitude is None else s.longitude for s in self.subscribers],
+            [np.nan if s.radius is None else s.radius for s in self.subscribers]
+        )
+        # Risk preferences as one boolean column per level
+        self.risk_preferences = {
+            "High": np.array([bool(s.notify_high_risk) for s in self.subscribers], dtype=bool),
+            "Medium": np.array([bool(s.notify_medium_risk) for s in self.subscribers], dtype=bool),
+            "Low": np.array([bool(s.notify_low_risk) for s in self.subscribers], dtype=bool),
+        }
+
+    def find_recipients(self, crime: Crime) -> list[Subscriber]:
+        """Active subscribers whose radius covers the crime and who want its risk level"""
+        if self.subscriber_index is None or crime.latitude is None or crime.longitude is None:
+            return []
+        positions = self.subscriber_index.query(crime.latitude, crime.longitude)
+        wants_level = self.risk_preferences.get(crime.risk_level)
+        if wants_level is None:
+            return []
+        return [self.subscribers[i] for i in positions[wants_level[positions]]]
+
+    async def notify_subscribers(self, crime: Crime, subscribers: list[Subscriber] = None, db: Session = None):
+        """Notify subscribers about a new crime incident
+
+        Passing ``subscribers`` re-indexes them; otherwise the list from the
+        last set_subscribers() call is used.
+        """
+        if subscribers is not None:
+            self.set_subscribers(subscribers)
+
+        # Digests (ALERT_DIGEST_MINUTES) are formed by the alert outbox in
+        # services/alerts.py, whose workers send them when the window closes
+        alerted = self.find_recipients(crime)
+        now = datetime.now()
+
+        # The email is the same for every recipient apart from its To header
+        email = self._render_email(crime) if any(s.notify_email for s in alerted) else None
+        sms = self._sms_text(crime)
+        # Concurrently: emails share the mailer's pooled connections and the
+        # gateway can put the identical texts into shared requests
+        await asyncio.gather(*(
+            self._send_email_notification(subscriber, email)
+            for subscriber in alerted if subscriber.notify_email
+        ), *(
+            self._send_sms_notification(subscriber, sms)
+            for subscriber in alerted if subscriber.notify_sms and subscriber.phone
+        ))
+        self._mark_notified(alerted, now, db)
+        return alerted
+
+    def _mark_notified(self, subscribers: list[Subscriber], now: datetime, db: Session = None):
+        """Record when every notified subscriber was alerted, with one UPDATE"""
         for subscriber in subscribers:
-            if not subscriber.is_active:
-                continue
-            
-            # Check if subscriber should be notified based on risk level
-            if not self._should_notify(subscriber, crime.risk_level):
-                continue
-            
-            # Check if subscriber is within radius
-            if not self._is_within_radius(subscriber, crime):
-                continue
-            
-            # Send notifications
-            if subscriber.prefers_email:
-                await self._send_email_notification(subscriber, crime)
-            
-            if subscriber.prefers_sms and subscriber.phone:
-                await self._send_sms_notification(subscriber, crime)
-            
-            # Update last notified timestamp
-            subscriber.last_notified = datetime.now()
+            subscriber.last_notified = now
+        if db is not None and subscribers:
+            db.query(Subscriber).filter(Subscriber.id.in_([s.id for s in subscribers])).update(
+                {Subscriber.last_notified: now}, synchronize_session=False
+            )
             db.commit()
-    
-    def _should_notify(self, subscriber: Subscriber, risk_level: str) -> bool:
-        """Check if subscriber should be notified based on risk level preferences"""
-        if risk_level == "High" and subscriber.notify_high_risk:
-            return True
-        if risk_level == "Medium" and subscriber.notify_medium_risk:
-            return True
-        if risk_level == "Low" and subscriber.notify_low_risk:
-            return True
-        return False
-    
-    def _is_within_radius(self, subscriber: Subscriber, crime: Crime) -> bool:
-        """Check if crime is within subscriber's alert radius"""
-        if not all([subscriber.latitude, subscriber.longitude, crime.latitude, crime.longitude]):
-            return False
-        
-        # Calculate distance using Haversine formula
-        from math import radians, sin, cos, sqrt, atan2
-        
-        R = 6371  # Earth's radius in kilometers
-        
-        lat1, lon1 = radians(subscriber.latitude), radians(subscriber.longitude)
-        lat2, lon2 = radians(crime.latitude), radians(crime.longitude)
-        
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        distance = R * c
-        
-        return distance <= subscriber.radius
-    
-    async def _send_email_notification(self, subscriber: Subscriber, crime: Crime):
-        """Send email notification to subscriber"""
-        try:
-            msg = MIMEMultipart()
-            msg['From'] = self.email_sender
-            msg['To'] = subscriber.email
-            msg['Subject'] = f"Crime Alert: {crime.incident_type} in {crime.city}"
-            
-            body = f"""
+
+    def _render_email(self, crime: Crime) -> RenderedEmail:
+        """Render the crime's alert email once for all recipients"""
+        body = f"""
             Crime Alert Notification
             
             Incident Type: {crime.incident_type}
@@ -95,34 +99,25 @@ class NotificationService:
             
             Stay safe and be vigilant!
             """
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            with smtplib.SMTP('smtp.gmail.com', 587) as server:
-                server.starttls()
-                server.login(self.email_sender, self.email_password)
-                server.send_message(msg)
+        msg = MIMEMultipart()
+        msg.attach(MIMEText(body, 'plain'))
+        return RenderedEmail(f"Crime Alert: {crime.incident_type} in {crime.city}", msg, self.email_sender)
+
+    def _sms_text(self, crime: Crime) -> str:
+        return f"Crime Alert: {crime.incident_type} in {crime.city}. Risk Level: {crime.risk_level}. Stay safe!"
+
+    async def _send_email_notification(self, subscriber: Subscriber, email: RenderedEmail):
+        """Send email notification to subscriber"""
+        try:
+            # Shared async SMTP pool instead of a new blocking session per recipient
+            await mailer.send_raw(email.for_recipient(subscriber.email), [subscriber.email], sender=self.email_sender)
         except Exception as e:
             print(f"Error sending email notification: {str(e)}")
     
-    async def _send_sms_notification(self, subscriber: Subscriber, crime: Crime):
+    async def _send_sms_notification(self, subscriber: Subscriber, message: str):
         """Send SMS notification to subscriber"""
         try:
-            message = f"Crime Alert: {crime.incident_type} in {crime.city}. Risk Level: {crime.risk_level}. Stay safe!"
-            
-            # Example using a hypothetical SMS API
-            # Replace with your preferred SMS service
-            response = requests.post(
-                "https://api.sms-service.com/send",
-                json={
-                    "api_key": self.sms_api_key,
-                    "sender": self.sms_sender,
-                    "recipient": subscriber.phone,
-                    "message": message
-                }
-            )
-            
-            if response.status_code != 200:
-                print(f"Error sending SMS: {response.text}")
+            # Shared async gateway: pooled connections, batching and rate limits
+            await sms_gateway.send(subscriber.phone, message)
         except Exception as e:
-            print(f"Error sending SMS notification: {str(e)}") 
\ No newline at end of file
+            print(f"Error sending SMS notification: {str(e)}")
@@ -1,73 +1,200 @@
 import joblib
 import os
+import numpy as np
+from services import forest, model_store, probability_table
+from services.bucketing import normalize_age_group, normalize_time_of_day
+
+# Column order the model was trained on
+FEATURE_ORDER = ['city', 'age_group', 'gender', 'time_of_day', 'month', 'day_of_week']
+
+# "Compiled" mode answers from a precomputed predict_proba table over every input
+USE_PROBABILITY_TABLE = os.getenv("PREDICTION_TABLE", "0") == "1"
+PROBABILITY_TABLE_DTYPE = os.getenv("PREDICTION_TABLE_DTYPE", "float32")
+
+# Scored once right after loading so the first real request is not the slow one
+WARMUP_INPUT = {
+    'city': 'Delhi', 'age_group': '19-30', 'gender': 'F',
+    'time_of_day': 'Evening', 'month': '1', 'day_of_week': 'Monday'
+}
+
+def feature_code_tables(label_encoders):
+    """value -> code dict for every input feature, built from the fitted encoders."""
+    return {
+        col: {str(value): code for code, value in enumerate(label_encoders[col].classes_)}
+        for col in FEATURE_ORDER
+    }
+
+class ModelBundle:
+    """One loaded model version with its encoders and lookup tables.
+
+    A bundle is never modified after loading, so the service can switch to a
+    new version by replacing a single reference while requests are running.
+    """
+
+    def __init__(self, model_path, encoders_path, version=None):
+        self.version = version
+        self.model_path = model_path
+        # Prefer the memory-mapped export: it loads in milliseconds and its pages
+        # are shared by every worker process instead of copied into each heap
+        self.model, model_sha256 = forest.load_model(model_path)
+        self.label_encoders = joblib.load(encoders_path)
+        self.compile_encoders()
+        self.probability_table = None
+        if USE_PROBABILITY_TABLE:
+            try:
+                self.probability_table = probability_table.compile_table(
+                    self.model, self.label_encoders, model_path, FEATURE_ORDER, PROBABILITY_TABLE_DTYPE, model_sha256
+                )
+            except Exception as e:
+                print(f"Could not compile probability table, using the model directly: {str(e)}")
+
+    def compile_encoders(self):
+        """Turn the fitted LabelEncoders into plain lookup tables.
+
+        ``feature_codes[col]`` maps a value to its code and ``crime_labels``
+        holds the crime name for each predict_proba column, so encoding and
+        decoding skip sklearn's per-call validation.
+        """
+        self.feature_codes = feature_code_tables(self.label_encoders)
+        crime_classes = self.label_encoders['crime'].classes_
+        self.crime_labels = [str(crime_classes[c]) for c in self.model.classes_]
+
+    def warm_up(self):
+        """Run one prediction through every code path the requests will use."""
+        row = {col: WARMUP_INPUT[col] for col in FEATURE_ORDER}
+        for col, table in self.feature_codes.items():
+            if row[col] not in table:
+                row[col] = next(iter(table))
+        self.predict_batch([row])
+
+    def encode(self, rows):
+        """Encode prepared input rows into one integer feature matrix.
+
+        Returns the matrix for the valid rows, their positions in ``rows`` and
+        an error message for every invalid row (None for valid ones).
+        """
+        errors = [None] * len(rows)
+        encoded = []
+        valid = []
+        tables = [(col, self.feature_codes[col]) for col in FEATURE_ORDER]
+        for i, row in enumerate(rows):
+            codes = []
+            for col, table in tables:
+                code = table.get(row[col])
+                if code is None:
+                    errors[i] = f"Invalid value for {col}: {row[col]}"
+                    break
+                codes.append(code)
+            else:
+                encoded.append(codes)
+                valid.append(i)
+        matrix = np.array(encoded, dtype=np.int64).reshape(len(valid), len(FEATURE_ORDER))
+        return matrix, valid, errors
+
+    def predict_batch(self, rows, top_k=3):
+        """Score every row with a single predict_proba call."""
+        matrix, valid, errors = self.encode(rows)
+        results = [{"error": error} for error in errors]
+        if not valid:
+            return results
+
+        if self.probability_table is not None:
+            probabilities = np.asarray(self.probability_table[tuple(matrix.T)], dtype=np.float64)
+        else:
+            probabilities = self.model.predict_proba(matrix)
+        labels = self.crime_labels
+        top_k = max(1, min(top_k, probabilities.shape[1]))
+        # argpartition finds the k best columns per row, then only those k are sorted
+        top = np.argpartition(-probabilities, top_k - 1, axis=1)[:, :top_k]
+        top_probabilities = np.take_along_axis(probabilities, top, axis=1)
+        order = np.argsort(-top_probabilities, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_probabilities = np.take_along_axis(top_probabilities, order, axis=1)
+
+        for row, i in enumerate(valid):
+            top_crimes = [
+                {"crime_type": labels[c], "probability": float(p)}
+                for c, p in zip(top[row], top_probabilities[row])
+            ]
+            results[i] = {
+                "predicted_crime_type": top_crimes[0]["crime_type"],
+                "top_crimes": top_crimes,
+                "probabilities": {crime["crime_type"]: crime["probability"] for crime in top_crimes},
+                "confidence": top_crimes[0]["probability"]
+            }
+        return results
 
 class CrimePredictionService:
     def __init__(self):
-        self.model = None
-        self.label_encoders = {}
+        self.bundle = None
+        self.load_error = None
+
+    @property
+    def model(self):
+        return self.bundle.model if self.bundle is not None else None
+
+    @property
+    def version(self):
+        return self.bundle.version if self.bundle is not None else None
 
-    def load_model(self):
+    def load_model(self, version=None):
+        """Load and warm up a model version (CURRENT by default), then swap it in.
+
+        On failure the previously loaded bundle keeps serving.
+        """
         try:
-            self.model = joblib.load('models/crime_predictor.pkl')
-            self.label_encoders = joblib.load('models/label_encoders.pkl')
+            version, model_path, encoders_path = model_store.model_files(version)
+            bundle = ModelBundle(model_path, encoders_path, version)
+            bundle.warm_up()
+            self.bundle = bundle
+            self.load_error = None
             return True
         except Exception as e:
             print(f"Error loading model: {str(e)}")
+            self.load_error = str(e)
             return False
 
+    def predict_batch(self, rows, top_k=3):
+        # Read the reference once so a concurrent reload cannot mix two versions
+        bundle = self.bundle
+        if bundle is None:
+            raise RuntimeError("Model not loaded")
+        return bundle.predict_batch(rows, top_k)
+
 # Initialize the prediction service
 prediction_service = CrimePredictionService()
 
-def predict_crime_type(city, age_group, gender, time_of_day, month, day_of_week):
+def prepare_input(city, age_group, gender, time_of_day, month, day_of_week):
+    return {
+        'city': city.strip(),
+        # Raw ages/hours are bucketed exactly as they were for training
+        'age_group': normalize_age_group(age_group) or age_group.strip(),
+        'gender': gender.strip(),
+        'time_of_day': normalize_time_of_day(time_of_day) or time_of_day.strip(),
+        'month': str(month).strip(),
+        'day_of_week': day_of_week.strip()
+    }
+
+def predict_crime_types(inputs, top_k=3):
+    """Predict for many inputs at once; each input is a dict of the six features."""
     try:
-        # Load the model if not already loaded
+        # Normally loaded at startup; only a process that never tried loads here
         if prediction_service.model is None:
-            if not prediction_service.load_model():
+            if prediction_service.load_error is not None or not prediction_service.load_model():
                 return {"error": "Model not found. Please train the model first."}
 
-        # Prepare input data
-        input_data = {
-            'city': city.strip(),
-            'age_group': age_group.strip(),
-            'gender': gender.strip(),
-            'time_of_day': time_of_day.strip(),
-            'month': str(month).strip(),
-            'day_of_week': day_of_week.strip()
-        }
-
-        # Ensure all features are encoded and in the correct order
-        feature_order = ['city', 'age_group', 'gender', 'time_of_day', 'month', 'day_of_week']
-        try:
-            encoded_features = []
-            for col in feature_order:
-                encoder = prediction_service.label_encoders.get(col)
-                val = input_data[col]
-                print(f"Encoding {col}: '{val}' | Available: {encoder.classes_}")
-                encoded_features.append(encoder.transform([val])[0])
-        except Exception as e:
-            return {"error": f"Invalid value for {col}: {val}"}
-
-        # Make prediction
-        prediction = prediction_service.model.predict([encoded_features])[0]
-        crime_desc = prediction_service.label_encoders['crime'].inverse_transform([prediction])[0]
-        probabilities = prediction_service.model.predict_proba([encoded_features])[0]
-        class_labels = prediction_service.model.classes_
-
-        # Get top 3 likely crimes
-        top_indices = probabilities.argsort()[-3:][::-1]
-        top_crimes = [
-            {
-                "crime_type": prediction_service.label_encoders['crime'].inverse_transform([class_labels[i]])[0],
-                "probability": float(probabilities[i])
-            }
-            for i in top_indices
-        ]
-
-        return {
-            "predicted_crime_type": crime_desc,
-            "top_crimes": top_crimes,
-            "probabilities": {prediction_service.label_encoders['crime'].inverse_transform([class_labels[i]])[0]: float(probabilities[i]) for i in top_indices},
-            "confidence": float(max(probabilities))
-        }
+        rows = [prepare_input(**{col: item[col] for col in FEATURE_ORDER}) for item in inputs]
+        return prediction_service.predict_batch(rows, top_k=top_k)
     except Exception as e:
-        return {"error": f"Prediction failed: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Prediction failed: {str(e)}"}
+
+def predict_crime_type(city, age_group, gender, time_of_day, month, day_of_week):
+    results = predict_crime_types([{
+        'city': city,
+        'age_group': age_group,
+        'gender': gender,
+        'time_of_day': time_of_day,
+        'month': month,
+        'day_of_week': day_of_week
+    }])
+    return results if isinstance(results, dict) else results[0]
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import numpy as np
+
+from services.dataset_cache import file_sha256
+
+TABLE_FORMAT_VERSION = 1
+# Rows scored per predict_proba call while building the table
+BUILD_CHUNK_SIZE = 20000
+
+
+def table_paths(model_path):
+    """The table lives next to the model: crime_predictor.proba.npy / .proba.json."""
+    base = os.path.splitext(model_path)[0]
+    return base + '.proba.npy', base + '.proba.json'
+
+
+def build_table(model, label_encoders, feature_order, dtype=np.float32):
+    """Evaluate predict_proba over every combination of encoded feature values.
+
+    The result has one axis per feature (sized by its encoder's classes) plus a
+    trailing axis over ``model.classes_``, so ``table[tuple(codes)]`` is the
+    probability row for one input.
+    """
+    shape = tuple(len(label_encoders[col].classes_) for col in feature_order)
+    size = int(np.prod(shape))
+    table = np.empty((size, len(model.classes_)), dtype=dtype)
+    for start in range(0, size, BUILD_CHUNK_SIZE):
+        flat = np.arange(start, min(start + BUILD_CHUNK_SIZE, size))
+        grid = np.stack(np.unravel_index(flat, shape), axis=1)
+        table[start:start + len(flat)] = model.predict_proba(grid)
+    return table.reshape(shape + (len(model.classes_),))
+
+
+def save_table(table, model_path, feature_order, model_sha256=None):
+    table_path, meta_path = table_paths(model_path)
+    meta = {
+        "format_version": TABLE_FORMAT_VERSION,
+        "model_sha256": model_sha256 or file_sha256(model_path),
+        "feature_order": list(feature_order),
+        "shape": list(table.shape),
+        "dtype": str(table.dtype),
+    }
+    directory = os.path.dirname(os.path.abspath(table_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npy')
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, table)
+    os.replace(tmp_path, table_path)
+    # The metadata is written last so a half-written table is never trusted
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+    return meta
+
+
+def load_table(model_path, feature_order, dtype=None, model_sha256=None):
+    """Memory-map the saved table, or return None if it is missing or was built
+    from a different model file (or with a different dtype, when one is given)."""
+    table_path, meta_path = table_paths(model_path)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format_version") != TABLE_FORMAT_VERSION or meta.get("feature_order") != list(feature_order):
+        return None
+    if dtype is not None and meta.get("dtype") != np.dtype(dtype).name:
+        return None
+    if meta.get("model_sha256") != (model_sha256 or file_sha256(model_path)):
+        return None
+    try:
+        table = np.load(table_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if list(table.shape) != meta["shape"]:
+        return None
+    return table
+
+
+def compile_table(model, label_encoders, model_path, feature_order, dtype=np.float32, model_sha256=None):
+    """Load the table for this model, building and saving it first if needed."""
+    model_sha256 = model_sha256 or file_sha256(model_path)
+    table = load_table(model_path, feature_order, dtype, model_sha256)
+    if table is None:
+        table = build_table(model, label_encoders, feature_order, dtype)
+        save_table(table, model_path, feature_order, model_sha256)
+    return table
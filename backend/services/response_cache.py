@@ -0,0 +1,107 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+import orjson
+from fastapi import Response
+
+from services.dataset import crime_dataset
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 256))
+# 0 keeps entries until the dataset changes; the data is static between loads
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 0))
+
+
+def _json_default(value):
+    # numpy/pandas scalars that orjson does not know natively
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(payload):
+    return orjson.dumps(payload, default=_json_default,
+                        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+class ResponseCache:
+    """JSON responses computed from the crime dataset, kept as serialized bytes.
+
+    Entries are keyed by endpoint and query parameters and tagged with the
+    dataset version they were computed from, so a reload with different data
+    never serves stale results. Least recently used entries are evicted past
+    ``max_entries``; ``ttl`` > 0 additionally expires them by age. Each
+    response carries an ETag and a matching If-None-Match gets a 304.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        # (endpoint, compute, params) precomputed by warm()
+        self.warmers = []
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def register(self, endpoint, compute, params=None):
+        """Compute this endpoint (with ``params``) in every warm()."""
+        self.warmers.append((endpoint, compute, params))
+
+    def get(self, endpoint, compute, params=None):
+        """(body, etag) for the endpoint, computing ``compute(**params)`` on a miss."""
+        params = params or {}
+        key = (endpoint, tuple(sorted(params.items())))
+        version = crime_dataset.version
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry_version, created, body, etag = entry
+            if entry_version == version and (self.ttl <= 0 or time.monotonic() - created < self.ttl):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return body, etag
+        self.misses += 1
+        body = dumps(compute(**params))
+        etag = '"' + hashlib.sha1(f"{version}:".encode() + body).hexdigest() + '"'
+        self.entries[key] = (version, time.monotonic(), body, etag)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return body, etag
+
+    def respond(self, request, endpoint, compute, params=None):
+        body, etag = self.get(endpoint, compute, params)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in request.headers.get("if-none-match", ""):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidate(self):
+        self.entries.clear()
+
+    def warm(self):
+        """Precompute every registered endpoint for the loaded dataset."""
+        for endpoint, compute, params in self.warmers:
+            try:
+                self.get(endpoint, compute, params)
+            except Exception as e:
+                print(f"Could not precompute {endpoint}: {str(e)}")
+
+    def metrics(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": sum(len(body) for _, _, body, _ in self.entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "dataset_version": crime_dataset.version,
+        }
+
+
+# Shared cache for the dataset-backed dashboard endpoints
+response_cache = ResponseCache()
+# A reload drops the old entries at once and precomputes the new ones
+crime_dataset.listeners.append(lambda: (response_cache.invalidate(), response_cache.warm()))
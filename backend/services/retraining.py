@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import joblib
+from bson import ObjectId
+from sklearn.ensemble import RandomForestClassifier
+
+from services import forest, model_store
+from services.prediction import FEATURE_ORDER, feature_code_tables, prepare_input
+
+# Only the fields turned into features are read from Mongo
+REPORT_PROJECTION = {
+    'city': 1, 'crime_type': 1, 'date': 1, 'time': 1, 'victim_age': 1, 'victim_gender': 1
+}
+
+
+def fetch_reports(collection, watermark=None):
+    """Reports inserted after ``watermark`` (an ObjectId string), oldest first.
+
+    ObjectIds grow with insertion time and ``_id`` is always indexed, so the
+    query reads only the new reports however long the history is.
+    """
+    query = {"_id": {"$gt": ObjectId(watermark)}} if watermark else {}
+    return list(collection.find(query, REPORT_PROJECTION).sort("_id", 1))
+
+
+def report_training_rows(reports, label_encoders):
+    """Encode reports the way train_model.py encodes the CSV.
+
+    Returns (features, target, skipped). Reports missing a feature or using a
+    city, value or crime type the encoders have never seen are skipped, since
+    adding categories needs a full retrain.
+    """
+    tables = feature_code_tables(label_encoders)
+    crime_codes = {str(value): code for code, value in enumerate(label_encoders['crime'].classes_)}
+    features, target = [], []
+    skipped = 0
+    for report in reports:
+        occurred = pd.to_datetime(f"{report.get('date', '')} {report.get('time', '')}", errors='coerce')
+        if pd.isna(occurred) or report.get('victim_age') is None or not report.get('victim_gender'):
+            skipped += 1
+            continue
+        row = prepare_input(
+            str(report.get('city', '')), str(report['victim_age']), str(report['victim_gender']),
+            str(occurred.hour), str(occurred.month), occurred.day_name()
+        )
+        codes = [tables[col].get(row[col]) for col in FEATURE_ORDER]
+        crime = crime_codes.get(str(report.get('crime_type', '')).strip().upper())
+        if crime is None or None in codes:
+            skipped += 1
+            continue
+        features.append(codes)
+        target.append(crime)
+    features = np.array(features, dtype=np.int64).reshape(len(target), len(FEATURE_ORDER))
+    return features, np.array(target, dtype=np.int64), skipped
+
+
+def retrain_incremental(collection, base_version=None, n_estimators=20, min_reports=50,
+                        version=None, make_current=True, n_jobs=-1, seed=42):
+    """Fit extra trees on the reports added since the base version's watermark and publish
+    base + new trees as a new model version.
+
+    Returns a summary dict; ``version`` in it is None when there were too few
+    new reports to train on (the watermark is then left where it was).
+    """
+    base_version, model_path, encoders_path = model_store.model_files(base_version)
+    label_encoders = joblib.load(encoders_path)
+
+    staging = tempfile.mkdtemp(prefix='retrain-')
+    try:
+        base_forest = forest.forest_dir(model_path)
+        if not os.path.isdir(base_forest):
+            # Older versions only have the pickle; flatten it once here
+            base_forest = os.path.join(staging, 'base.forest')
+            forest.export_forest(joblib.load(model_path), base_forest)
+        watermark = forest.MappedForest(base_forest).meta.get("report_watermark")
+
+        reports = fetch_reports(collection, watermark)
+        features, target, skipped = report_training_rows(reports, label_encoders)
+        summary = {"base_version": base_version, "reports": len(reports), "used": len(target),
+                   "skipped": skipped, "version": None}
+        if len(target) < min_reports:
+            return summary
+
+        clf = RandomForestClassifier(n_estimators=n_estimators, class_weight='balanced',
+                                     random_state=seed, n_jobs=n_jobs)
+        clf.fit(features, target)
+
+        new_model_path = os.path.join(staging, model_store.MODEL_FILE)
+        new_encoders_path = os.path.join(staging, model_store.ENCODERS_FILE)
+        forest.append_trees(base_forest, clf, forest.forest_dir(new_model_path), extra_meta={
+            "report_watermark": str(reports[-1]["_id"]),
+            "base_version": base_version,
+        })
+        shutil.copy2(encoders_path, new_encoders_path)
+        summary["version"] = model_store.publish(new_model_path, new_encoders_path, version,
+                                                 make_current=make_current)
+        return summary
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
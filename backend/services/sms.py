@@ -0,0 +1,260 @@
+import asyncio
+import importlib
+import os
+import time
+from collections import deque
+import httpx
+
+SMS_API_URL = os.getenv("SMS_API_URL", "https://api.sms-service.com/send")
+SMS_TIMEOUT = float(os.getenv("SMS_TIMEOUT", 10))
+# Recipients per provider request; above 1 the HTTP provider sends a "recipients" list
+SMS_BULK_SIZE = int(os.getenv("SMS_BULK_SIZE", 100))
+# "http", "fake" (kept in memory), "disabled" or module:Class; without SMS_API_KEY
+# the default is "disabled", which rejects every text so only SMS jobs dead-letter
+SMS_PROVIDER = os.getenv("SMS_PROVIDER", "http" if os.getenv("SMS_API_KEY") else "disabled")
+SMS_MAX_CONCURRENCY = int(os.getenv("SMS_MAX_CONCURRENCY", 4))
+# Messages (one per recipient) allowed per second across all requests
+SMS_RATE_PER_SECOND = float(os.getenv("SMS_RATE_PER_SECOND", 10))
+# How long a message waits for others with the same text to share its request
+SMS_BATCH_LATENCY_MS = float(os.getenv("SMS_BATCH_LATENCY_MS", 50))
+
+
+class SMSRejected(Exception):
+    """The provider refused the request itself (bad number, bad credentials); retrying will not help."""
+
+
+class SMSProvider:
+    """Sends one text to a list of recipients. ``max_recipients`` is the most one call accepts."""
+
+    max_recipients = 1
+
+    async def send(self, recipients, text):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class HTTPSMSProvider(SMSProvider):
+    """JSON-over-HTTP gateway, reusing the connections of one shared httpx.AsyncClient."""
+
+    def __init__(self):
+        self.url = SMS_API_URL
+        self.api_key = os.getenv("SMS_API_KEY")
+        if not self.api_key:
+            raise ValueError("SMS_API_KEY is not set")
+        self.sender = os.getenv("SMS_SENDER")
+        self.max_recipients = max(1, SMS_BULK_SIZE)
+        self.client = None
+
+    async def send(self, recipients, text):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=SMS_TIMEOUT,
+                limits=httpx.Limits(max_connections=SMS_MAX_CONCURRENCY, max_keepalive_connections=SMS_MAX_CONCURRENCY),
+            )
+        body = {"api_key": self.api_key, "sender": self.sender, "message": text}
+        if len(recipients) == 1:
+            body["recipient"] = recipients[0]
+        else:
+            body["recipients"] = list(recipients)
+        response = await self.client.post(self.url, json=body)
+        # 429 and 5xx are worth retrying; any other error status is final
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            raise SMSRejected(f"{response.status_code}: {response.text}")
+        response.raise_for_status()
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+class FakeSMSProvider(SMSProvider):
+    """Keeps the last messages in memory instead of sending them; for tests and local runs."""
+
+    max_recipients = 100
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sent = deque(maxlen=1000)
+        self.requests = 0
+
+    async def send(self, recipients, text):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.requests += 1
+        for recipient in recipients:
+            self.sent.append((recipient, text))
+
+
+class DisabledSMSProvider(SMSProvider):
+    """Used when no provider is configured: every text is rejected, so its job is dead-lettered."""
+
+    max_recipients = 100
+
+    async def send(self, recipients, text):
+        raise SMSRejected("SMS is not configured (set SMS_API_KEY or SMS_PROVIDER)")
+
+
+PROVIDERS = {"http": HTTPSMSProvider, "fake": FakeSMSProvider, "disabled": DisabledSMSProvider}
+
+
+def load_provider(name):
+    """A provider from PROVIDERS, or any SMSProvider subclass given as ``module:Class``."""
+    if name in PROVIDERS:
+        return PROVIDERS[name]()
+    if ":" not in name:
+        raise ValueError(f"Unknown SMS provider {name!r}")
+    module, _, attribute = name.partition(":")
+    return getattr(importlib.import_module(module), attribute)()
+
+
+class RateLimiter:
+    """Token bucket: ``acquire(n)`` waits until n tokens have accrued at ``rate`` per second."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = max(burst or rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = None
+
+    async def acquire(self, n=1):
+        if self.rate <= 0:
+            return
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        # First come, first served: one waiter at a time refills the bucket
+        async with self.lock:
+            n = min(n, self.capacity)
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+
+class SMSGateway:
+    """Async SMS sending with request batching, a concurrency cap and a rate limit.
+
+    Messages with the same text sent within ``batch_latency_ms`` of each
+    other (every recipient of one alert) share provider requests of up to
+    ``provider.max_recipients`` numbers. At most ``max_concurrency``
+    requests are in flight and at most ``rate`` messages go out per second;
+    callers wait rather than block the event loop. ``send`` raises the
+    provider's error for the caller's own message; ``send_many`` sends a
+    list of numbers at once, without waiting for more.
+    """
+
+    def __init__(self, provider=None, max_concurrency=SMS_MAX_CONCURRENCY, rate=SMS_RATE_PER_SECOND,
+                 batch_latency_ms=SMS_BATCH_LATENCY_MS):
+        self.provider_name = provider or SMS_PROVIDER
+        self.provider = None
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate = rate
+        self.batch_latency = batch_latency_ms / 1000
+        self.limiter = None
+        self.slots = None
+        self.pending = {}
+        self.timers = {}
+        self.tasks = set()
+        self.requests = 0
+        self.sent = 0
+        self.failed = 0
+
+    def setup(self):
+        """Create the provider (main.py calls this at startup).
+
+        A provider that cannot be created is replaced by the disabled one with
+        a warning: SMS jobs then dead-letter while the rest of the API runs.
+        """
+        if self.provider is None:
+            try:
+                self.provider = load_provider(self.provider_name)
+            except Exception as e:
+                print(f"Warning: SMS provider {self.provider_name!r} unavailable, SMS alerts are disabled: {str(e)}")
+                self.provider_name = "disabled"
+                self.provider = DisabledSMSProvider()
+            if isinstance(self.provider, FakeSMSProvider):
+                print("SMS_PROVIDER=fake: alert texts are kept in memory, not sent")
+            elif isinstance(self.provider, DisabledSMSProvider):
+                print("Warning: no SMS provider configured; SMS alerts will be dead-lettered")
+            self.limiter = RateLimiter(self.rate, burst=max(self.rate, self.provider.max_recipients))
+            self.slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def send(self, phone, text):
+        self.setup()
+        future = asyncio.get_running_loop().create_future()
+        batch = self.pending.setdefault(text, [])
+        batch.append((phone, future))
+        if len(batch) >= self.provider.max_recipients or self.batch_latency <= 0:
+            self.flush(text)
+        elif text not in self.timers:
+            self.timers[text] = asyncio.get_running_loop().call_later(self.batch_latency, self.flush, text)
+        return await future
+
+    def flush(self, text):
+        timer = self.timers.pop(text, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self.pending.pop(text, [])
+        if not batch:
+            return
+        task = asyncio.ensure_future(self.run(text, batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def send_many(self, phones, text):
+        """Send one text to ``phones`` now, in provider requests of up to max_recipients numbers."""
+        self.setup()
+        size = self.provider.max_recipients
+        await asyncio.gather(*(self.request(phones[i:i + size], text) for i in range(0, len(phones), size)))
+
+    async def request(self, phones, text):
+        async with self.slots:
+            await self.limiter.acquire(len(phones))
+            self.requests += 1
+            try:
+                await self.provider.send(phones, text)
+            except Exception:
+                self.failed += len(phones)
+                raise
+        self.sent += len(phones)
+
+    async def run(self, text, batch):
+        try:
+            await self.request([phone for phone, _ in batch], text)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    async def close(self):
+        for text in list(self.pending):
+            self.flush(text)
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.provider is not None:
+            await self.provider.close()
+
+    def metrics(self):
+        return {
+            "provider": self.provider_name,
+            # False for the fake (marked delivered, not sent) and disabled (dead-lettered) providers
+            "delivering": self.provider_name not in ("fake", "disabled"),
+            "requests": self.requests,
+            "sent": self.sent,
+            "failed": self.failed,
+            "waiting": sum(len(batch) for batch in self.pending.values()),
+        }
+
+
+# Shared gateway for alert SMS; main.py closes it on shutdown
+sms_gateway = SMSGateway()
@@ -0,0 +1,83 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; every argument may be a scalar or an array (degrees)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class RadiusGridIndex:
+    """Points with their own alert radius, bucketed into lat/lng grids.
+
+    ``query(lat, lng)`` returns the positions of every point whose radius
+    covers the given location. Only the grid cells around the location are
+    read, then one vectorized haversine pass filters those candidates, so the
+    cost follows the local density rather than the total number of points.
+
+    Each point goes into the finest of several grids (cells ``cell_km``,
+    4x that, 16x, ...) whose cell is at least as large as its radius, so a
+    query only ever needs the cells next to its own in each grid. Longitude
+    wrap-around at +/-180 is not handled.
+    """
+
+    def __init__(self, latitudes, longitudes, radii, cell_km=5.0, level_factor=4):
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.radii = np.asarray(radii, dtype=float)
+        self.size = len(self.latitudes)
+        valid = ~(np.isnan(self.latitudes) | np.isnan(self.longitudes) | np.isnan(self.radii))
+        valid &= self.radii >= 0
+
+        # (cell size in degrees, number of columns, sorted cell keys, positions in key order)
+        self.levels = []
+        remaining = np.flatnonzero(valid)
+        level_km = cell_km
+        while remaining.size:
+            in_level = self.radii[remaining] <= level_km
+            # Once a cell spans half the globe its 3x3 window covers everything left
+            if level_km >= 180 * KM_PER_DEGREE:
+                in_level[:] = True
+            cell_degrees = level_km / KM_PER_DEGREE
+            n_cols = int(np.ceil(360 / cell_degrees)) + 1
+            positions = remaining[in_level]
+            if positions.size:
+                rows, cols = self._rows_cols(self.latitudes[positions], self.longitudes[positions], cell_degrees)
+                keys = rows * n_cols + cols
+                order = np.argsort(keys, kind='stable')
+                self.levels.append((cell_degrees, n_cols, keys[order], positions[order]))
+            remaining = remaining[~in_level]
+            level_km *= level_factor
+
+    @staticmethod
+    def _rows_cols(latitudes, longitudes, cell_degrees):
+        rows = np.floor((np.asarray(latitudes) + 90) / cell_degrees).astype(np.int64)
+        cols = np.floor((np.asarray(longitudes) + 180) / cell_degrees).astype(np.int64)
+        return rows, cols
+
+    def candidates(self, lat, lng):
+        """Positions of points that might cover (lat, lng): the neighbouring cells of every grid."""
+        slices = []
+        for cell_degrees, n_cols, keys, positions in self.levels:
+            row, col = self._rows_cols(lat, lng, cell_degrees)
+            # A cell spans cell_km north-south but less east-west away from the equator
+            widest_lat = min(abs(lat) + cell_degrees, 89.9)
+            col_span = int(np.ceil(1 / np.cos(np.radians(widest_lat))))
+            row_starts = np.arange(row - 1, row + 2) * n_cols
+            starts = np.searchsorted(keys, row_starts + max(col - col_span, 0), side='left')
+            ends = np.searchsorted(keys, row_starts + min(col + col_span, n_cols - 1), side='right')
+            slices.extend(positions[start:end] for start, end in zip(starts, ends) if end > start)
+        return np.concatenate(slices) if slices else np.array([], dtype=np.int64)
+
+    def query(self, lat, lng):
+        """Positions of every point whose radius covers (lat, lng), nearest first."""
+        candidates = self.candidates(lat, lng)
+        if candidates.size == 0:
+            return candidates
+        distances = haversine_km(self.latitudes[candidates], self.longitudes[candidates], lat, lng)
+        inside = distances <= self.radii[candidates]
+        return candidates[inside][np.argsort(distances[inside], kind='stable')]
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from services.analysis_cube import HOURS
+from services.counting import joint_counts, value_codes
+from services.dataset import crime_dataset
+
+# Axes of the joint count array; each ends in a slot for missing values
+CITY, CRIME, HOUR, GENDER, DOMAIN = range(5)
+COLUMNS = {CITY: 'City', CRIME: 'Crime Description', HOUR: 'Hour', GENDER: 'Victim Gender', DOMAIN: 'Crime Domain'}
+
+
+def summary_counts(df):
+    """Row counts by city x crime x hour x gender x domain, from one bincount.
+
+    Every /summary breakdown is a sum over this array, so the rows are read
+    once however many breakdowns there are. Returns (counts, labels per axis).
+    """
+    labels = {axis: df[column].cat.categories.tolist() for axis, column in COLUMNS.items() if axis != HOUR}
+    # Hours come out as floats, like the groupby on the float Hour column did
+    labels[HOUR] = [float(hour) for hour in HOURS]
+    codes = [value_codes(df[COLUMNS[axis]], HOURS if axis == HOUR else labels[axis]) for axis in range(len(COLUMNS))]
+    shape = tuple(len(labels[axis]) + 1 for axis in range(len(COLUMNS)))
+    return joint_counts(codes, shape), labels
+
+
+def marginal(counts, axis, other):
+    """Counts by (axis, other), summed over every remaining axis."""
+    table = counts.sum(axis=tuple(a for a in range(counts.ndim) if a not in (axis, other)))
+    return table if axis < other else table.T
+
+
+def distribution(labels, counts):
+    """{label: count} for the non-zero counts, largest first (ties in label order)."""
+    order = np.argsort(-counts, kind='stable')
+    return {labels[i]: int(counts[i]) for i in order if counts[i] > 0}
+
+
+def grouped(counts, labels, axis, names, count_axis, distributions, top=None):
+    """One record per value of ``axis`` that occurs in the data.
+
+    ``names`` are the output keys of the value and its count; the count is
+    the number of its rows with a value on ``count_axis``. ``distributions``
+    maps output keys to the axes whose value counts are nested per record.
+    With ``top`` the records are the ``top`` largest counts, largest first,
+    ties in label order (see top_positions).
+    """
+    n = len(labels[axis])
+    by_count_axis = marginal(counts, axis, count_axis)[:n]
+    present = by_count_axis.sum(axis=1) > 0
+    totals = by_count_axis[:, :-1].sum(axis=1)
+    positions = np.flatnonzero(present)
+    if top is not None:
+        positions = positions[np.argsort(-totals[positions], kind='stable')][:top]
+
+    tables = {key: marginal(counts, axis, other) for key, other in distributions.items()}
+    records = []
+    for i in positions:
+        record = {names[0]: labels[axis][i], names[1]: int(totals[i])}
+        for key, other in distributions.items():
+            record[key] = distribution(labels[other], tables[key][i, :-1])
+        records.append(record)
+    return records
+
+
+def summary(df):
+    """The /api/visualization/summary payload."""
+    counts, labels = summary_counts(df)
+    gender_and_domain = {'gender_distribution': GENDER, 'domain_distribution': DOMAIN}
+
+    monthly_trends = df.groupby(['Year', 'Month']).size().reset_index(name='count')
+    monthly_trends['MonthName'] = pd.to_datetime(monthly_trends['Month'], format='%m').dt.strftime('%B')
+
+    return {
+        "city_stats": grouped(counts, labels, CITY, ('city', 'total_crimes'), CRIME, gender_and_domain, top=10),
+        "crime_type_stats": grouped(counts, labels, CRIME, ('crimeType', 'count'), CITY, gender_and_domain, top=10),
+        "monthly_trends": monthly_trends.to_dict(orient='records'),
+        "hourly_stats": grouped(counts, labels, HOUR, ('hour', 'count'), CRIME, {'domain_distribution': DOMAIN}),
+        "gender_stats": grouped(counts, labels, GENDER, ('gender', 'count'), CRIME, {'domain_distribution': DOMAIN}),
+    }
+
+
+def top_positions(totals, n):
+    """Positions of the ``n`` largest non-zero totals, largest first.
+
+    Equal totals come out in label order (positions follow the sorted
+    categories), so the result does not depend on row order. The
+    value_counts() code this replaced ordered ties by first appearance.
+    """
+    order = np.argsort(-totals, kind='stable')[:n]
+    return order[totals[order] > 0]
+
+
+class CityCrimeMatrix:
+    """Row counts by (city, crime type), built with one bincount.
+
+    Any top-N cities by top-M crimes view is a slice of it, so a request
+    costs O(cities + crimes) instead of a mask over the dataset per cell.
+    Like value_counts(), the totals include rows missing the other value.
+    """
+
+    def __init__(self, df):
+        self.cities = df['City'].cat.categories.tolist()
+        self.crimes = df['Crime Description'].cat.categories.tolist()
+        codes = [value_codes(df['City'], self.cities), value_codes(df['Crime Description'], self.crimes)]
+        self.counts = joint_counts(codes, (len(self.cities) + 1, len(self.crimes) + 1))
+        self.city_totals = self.counts[:-1].sum(axis=1)
+        self.crime_totals = self.counts[:, :-1].sum(axis=0)
+
+    def radar(self, top_cities=5, top_crimes=5):
+        """One record per top city: {'City': city, crime: count, ...} over the top crimes."""
+        cities = top_positions(self.city_totals, top_cities)
+        crimes = top_positions(self.crime_totals, top_crimes)
+        table = self.counts[np.ix_(cities, crimes)]
+        return [
+            dict({'City': self.cities[c]}, **{self.crimes[k]: int(n) for k, n in zip(crimes, row)})
+            for c, row in zip(cities, table)
+        ]
+
+
+_matrix = None
+_matrix_version = None
+
+
+def get_city_crime_matrix():
+    """Return the matrix for the currently loaded dataset, building it on first use."""
+    global _matrix, _matrix_version
+    if crime_dataset.df.empty:
+        return None
+    if _matrix is None or _matrix_version != crime_dataset.version:
+        _matrix = CityCrimeMatrix(crime_dataset.df)
+        _matrix_version = crime_dataset.version
+    return _matrix
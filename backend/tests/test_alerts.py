@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import alerts
+
+
+class Subscribers:
+    """In-memory subscribers collection; applies the $set and $max of update_many."""
+
+    def __init__(self, documents):
+        self.documents = {document["_id"]: document for document in documents}
+
+    async def update_many(self, query, update):
+        for _id in query["_id"]["$in"]:
+            document = self.documents[_id]
+            document.update(update.get("$set", {}))
+            for field, value in update.get("$max", {}).items():
+                if document.get(field) is None or document[field] < value:
+                    document[field] = value
+
+
+class Outbox:
+    """In-memory stand-in for the outbox writes of a fan-out, deduplicated by key like Mongo."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.digests = {}
+
+    async def enqueue_many(self, jobs):
+        for kind, key, payload in jobs:
+            self.jobs.setdefault(key, (kind, payload))
+
+    async def collect_many(self, entries):
+        for kind, key, due_at, payload, item in entries:
+            items = self.digests.setdefault(key, [])
+            if item not in items:
+                items.append(item)
+        return []
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture
+def fan_out_stub(monkeypatch):
+    queued_at = datetime(2026, 10, 1, 12, 0)
+    subscribers = Subscribers(
+        # Even ids were alerted five minutes ago, so this report joins their digest
+        [{"_id": f"s{i}", "email": f"s{i}@example.org",
+          "last_notified": queued_at - timedelta(minutes=5) if i % 2 == 0 else None}
+         for i in range(10)]
+    )
+    outbox = Outbox()
+    crash = {"after": None}
+
+    async def find_recipients(report):
+        for served, _id in enumerate(sorted(subscribers.documents)):
+            if crash["after"] is not None and served == crash["after"]:
+                raise Crash()
+            yield {**subscribers.documents[_id]}
+
+    monkeypatch.setattr(alerts, "find_recipients", find_recipients)
+    monkeypatch.setattr(alerts, "subscribers_collection", subscribers)
+    monkeypatch.setattr(alerts.alert_outbox, "enqueue_many", outbox.enqueue_many)
+    monkeypatch.setattr(alerts.alert_outbox, "collect_many", outbox.collect_many)
+    monkeypatch.setattr(alerts, "FAN_OUT_CHUNK", 3)
+    monkeypatch.setattr(alerts, "ALERT_BCC_BATCH_SIZE", 0)
+    monkeypatch.setattr(alerts, "ALERT_DIGEST_MINUTES", 15)
+    payload = {"report_id": "652f0c9e8b1e8a0001a1b2c3", "queued_at": queued_at,
+               "report": {"crime_type": "THEFT", "city": "Delhi"}}
+    return payload, outbox, crash
+
+
+def deliveries(outbox, report_id):
+    """Subscriber address -> times the report reaches it, immediately or in a digest."""
+    counts = {}
+    for kind, payload in outbox.jobs.values():
+        counts[payload["to"]] = counts.get(payload["to"], 0) + 1
+    for key, items in outbox.digests.items():
+        to = key.split(":")[0] + "@example.org"
+        counts[to] = counts.get(to, 0) + sum(item["report_id"] == report_id for item in items)
+    return counts
+
+
+def test_retried_fan_out_delivers_once_to_each_subscriber(fan_out_stub):
+    payload, outbox, crash = fan_out_stub
+
+    async def main():
+        # The first attempt dies after two chunks have been written, the second runs to the end
+        crash["after"] = 7
+        with pytest.raises(Crash):
+            await alerts.fan_out(payload, "report:1")
+        crash["after"] = None
+        await alerts.fan_out(payload, "report:1")
+
+    asyncio.run(main())
+    counts = deliveries(outbox, payload["report_id"])
+    assert counts == {f"s{i}@example.org": 1 for i in range(10)}
+    assert len(outbox.digests) == 5
+
+
+def test_fan_out_run_twice_delivers_once_to_each_subscriber(fan_out_stub):
+    payload, outbox, _ = fan_out_stub
+
+    async def main():
+        await alerts.fan_out(payload, "report:1")
+        await alerts.fan_out(payload, "report:1")
+
+    asyncio.run(main())
+    assert deliveries(outbox, payload["report_id"]) == {f"s{i}@example.org": 1 for i in range(10)}
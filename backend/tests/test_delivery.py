@@ -0,0 +1,215 @@
+import asyncio
+import socket
+import time
+from email.mime.text import MIMEText
+
+import aiosmtplib
+import pytest
+from aiosmtpd.controller import Controller
+
+from services.mailer import RenderedEmail, SMTPMailer
+from services import sms
+from services.sms import FakeSMSProvider, RateLimiter, SMSGateway, SMSProvider, SMSRejected
+
+
+class RecordingHandler:
+    """aiosmtpd handler keeping every accepted envelope; refuses addresses at refused.example."""
+
+    def __init__(self):
+        self.envelopes = []
+        self.stall = 0
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.endswith("@refused.example"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.stall:
+            self.stall -= 1
+            await asyncio.sleep(1)
+        self.envelopes.append((envelope.mail_from, list(envelope.rcpt_tos), envelope.content))
+        return "250 Message accepted"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_stub(monkeypatch):
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    monkeypatch.setenv("SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(controller.port))
+    monkeypatch.setenv("SMTP_STARTTLS", "0")
+    monkeypatch.setenv("SMTP_USER", "")
+    monkeypatch.setenv("FROM_EMAIL", "alerts@example.org")
+    yield handler
+    controller.stop()
+
+
+def alert_email():
+    return RenderedEmail("Crime Alert: THEFT in Delhi", MIMEText("Stay safe", "plain"), "alerts@example.org")
+
+
+def test_mailer_reuses_pooled_connections(smtp_stub):
+    async def main():
+        mailer = SMTPMailer(pool_size=2)
+        email = alert_email()
+        addresses = [f"user{i}@example.org" for i in range(20)]
+        await asyncio.gather(*(mailer.send_raw(email.for_recipient(to), [to]) for to in addresses))
+        await mailer.close()
+        return mailer, addresses
+
+    mailer, addresses = asyncio.run(main())
+    assert sorted(rcpt[0] for _, rcpt, _ in smtp_stub.envelopes) == sorted(addresses)
+    assert all(sender == "alerts@example.org" for sender, _, _ in smtp_stub.envelopes)
+    assert mailer.connections_opened <= 2
+    assert mailer.metrics()["sent"] == 20
+
+
+def test_mailer_bcc_message_hides_recipients(smtp_stub):
+    async def main():
+        mailer = SMTPMailer(pool_size=1)
+        await mailer.send_raw(alert_email().for_bcc(), ["a@example.org", "b@example.org"])
+        await mailer.close()
+
+    asyncio.run(main())
+    [(_, recipients, content)] = smtp_stub.envelopes
+    assert recipients == ["a@example.org", "b@example.org"]
+    assert b"a@example.org" not in content
+
+
+def test_mailer_raises_for_refused_recipient(smtp_stub):
+    async def main():
+        mailer = SMTPMailer(pool_size=1)
+        email = alert_email()
+        with pytest.raises(aiosmtplib.SMTPRecipientsRefused):
+            await mailer.send_raw(email.for_recipient("gone@refused.example"), ["gone@refused.example"])
+        # The session survives the refusal and is reused
+        await mailer.send_raw(email.for_recipient("ok@example.org"), ["ok@example.org"])
+        await mailer.close()
+        return mailer
+
+    mailer = asyncio.run(main())
+    assert mailer.connections_opened == 1
+    assert mailer.metrics()["failed"] == 1
+    assert len(smtp_stub.envelopes) == 1
+
+
+def test_mailer_discards_a_connection_that_timed_out(smtp_stub):
+    async def main():
+        mailer = SMTPMailer(pool_size=1, timeout=0.2)
+        email = alert_email()
+        smtp_stub.stall = 1
+        with pytest.raises(aiosmtplib.SMTPTimeoutError):
+            await mailer.send_raw(email.for_recipient("slow@example.org"), ["slow@example.org"])
+        assert mailer.idle == []
+        # The next message goes out on a new session, not the one left mid-DATA
+        await mailer.send_raw(email.for_recipient("ok@example.org"), ["ok@example.org"])
+        await mailer.close()
+        return mailer
+
+    mailer = asyncio.run(main())
+    assert mailer.connections_opened == 2
+    assert mailer.metrics()["failed"] == 1
+    assert mailer.metrics()["sent"] == 1
+
+
+def test_gateway_batches_messages_with_the_same_text():
+    async def main():
+        gateway = SMSGateway(provider="fake", rate=0, batch_latency_ms=20)
+        await asyncio.gather(
+            *(gateway.send(f"+9100000{i:04d}", "Crime Alert: THEFT in Delhi") for i in range(250)),
+            gateway.send("+919999999999", "Crime Alert: 2 incidents near you"),
+        )
+        await gateway.close()
+        return gateway
+
+    gateway = asyncio.run(main())
+    # 250 numbers in requests of at most 100, plus one for the other text
+    assert gateway.provider.requests == 4
+    assert len(gateway.provider.sent) == 251
+    assert gateway.metrics()["sent"] == 251
+
+
+def test_gateway_send_many_splits_by_provider_limit():
+    async def main():
+        gateway = SMSGateway(provider="fake", rate=0)
+        await gateway.send_many([f"+91{i}" for i in range(150)], "Crime Alert")
+        return gateway
+
+    gateway = asyncio.run(main())
+    assert gateway.provider.requests == 2
+    assert gateway.metrics()["waiting"] == 0
+
+
+class RejectingProvider(SMSProvider):
+    max_recipients = 10
+
+    async def send(self, recipients, text):
+        raise SMSRejected("400: invalid sender")
+
+
+def test_gateway_raises_the_provider_error_for_every_message(monkeypatch):
+    monkeypatch.setitem(sms.PROVIDERS, "rejecting", RejectingProvider)
+
+    async def main():
+        gateway = SMSGateway(provider="rejecting", rate=0, batch_latency_ms=10)
+        results = await asyncio.gather(*(gateway.send(f"+91{i}", "hi") for i in range(3)), return_exceptions=True)
+        return gateway, results
+
+    gateway, results = asyncio.run(main())
+    assert all(isinstance(result, SMSRejected) for result in results)
+    assert gateway.requests == 1
+    assert gateway.metrics()["failed"] == 3
+
+
+def test_rate_limiter_allows_a_burst_then_waits():
+    async def main():
+        limiter = RateLimiter(rate=100, burst=10)
+        start = time.monotonic()
+        await limiter.acquire(10)
+        burst = time.monotonic() - start
+        await limiter.acquire(20)
+        return burst, time.monotonic() - start
+
+    burst, total = asyncio.run(main())
+    assert burst < 0.05
+    # acquire(20) is capped at the capacity of 10, which takes 0.1s to refill at 100 per second
+    assert total >= 0.09
+
+
+def test_gateway_paces_messages_by_the_rate_limit():
+    async def main():
+        gateway = SMSGateway(provider="fake", rate=200, batch_latency_ms=0)
+        start = time.monotonic()
+        # The bucket starts with max(rate, provider.max_recipients) = 200 tokens
+        await asyncio.gather(*(gateway.send(f"+91{i}", f"text {i}") for i in range(240)))
+        return time.monotonic() - start, gateway
+
+    elapsed, gateway = asyncio.run(main())
+    assert len(gateway.provider.sent) == 240
+    assert elapsed >= 0.15
+    assert isinstance(gateway.provider, FakeSMSProvider)
+
+
+def test_gateway_without_a_usable_provider_rejects_texts(monkeypatch):
+    monkeypatch.delenv("SMS_API_KEY", raising=False)
+
+    async def main():
+        gateway = SMSGateway(provider="http", rate=0)
+        # Startup must not fail; the texts are rejected instead
+        gateway.setup()
+        with pytest.raises(SMSRejected):
+            await gateway.send_many(["+910000000001"], "Crime Alert")
+        return gateway
+
+    gateway = asyncio.run(main())
+    assert gateway.metrics()["provider"] == "disabled"
+    assert gateway.metrics()["delivering"] is False